@@ -0,0 +1,254 @@
+"""
+Benchmark: the generate-graphs / generate-report pipeline end to end.
+
+For each synthetic dataset shape (sales, stock, wide; see synthetic.py) and
+size it measures:
+
+- generate_chart per chart type: figure build and PNG encode on the full
+  data, plus the render engine path (reduction + worker process)
+- generate_graphs_zip and create_pdf_report
+- the /generate-graphs and /generate-report endpoints: sequential latency
+  (p50/p95) and throughput under concurrent requests
+
+The LLM is replaced by the local provider returning a fixed suggestion set after
+--llm-latency seconds. The chart and LLM caches are disabled unless
+--with-caches is given, so every run pays for the full pipeline. Results are
+written as JSON; --compare prints the change against an earlier result file.
+The endpoint section drives the app in-process through httpx (the client
+FastAPI's TestClient uses), so httpx must be installed.
+
+    python benchmarks/pipeline_suite.py [--sizes 1000,10000] [--json out.json] [--compare base.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _disable_caches():
+    # Read by config.py at import time, so this runs before the app modules are imported
+    os.environ["CHART_CACHE_MEMORY_MB"] = "0"
+    os.environ["CHART_CACHE_DIR"] = ""
+    os.environ["LLM_CACHE_MAX_ENTRIES"] = "0"
+
+
+def _timings(samples: list) -> dict:
+    ordered = sorted(samples)
+    return {
+        "median_ms": round(statistics.median(ordered) * 1000, 2),
+        "min_ms": round(ordered[0] * 1000, 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 2),
+        "runs": len(ordered),
+    }
+
+
+def _measure(func, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return _timings(samples)
+
+
+def bench_charts(frame, suggestions: list, repeat: int) -> dict:
+    import io
+
+    from dataset import Dataset
+    from graph_gen import generate_chart
+    from render_engine import render_chart
+
+    dataset = Dataset(frame)
+    results = {}
+    for chart in suggestions:
+        build, encode = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fig = generate_chart(frame, chart)
+            built = time.perf_counter()
+            fig.savefig(io.BytesIO(), format="png", bbox_inches="tight", dpi=200)
+            build.append(built - start)
+            encode.append(time.perf_counter() - built)
+        results[chart["type"]] = {
+            "generate_chart": _timings(build),
+            "savefig_png": _timings(encode),
+            "render_engine": _measure(lambda: render_chart(dataset, chart), repeat),
+        }
+    return results
+
+
+def bench_outputs(frame, suggestions: list, repeat: int) -> dict:
+    from dataset import Dataset
+    from graph_gen import generate_graphs_zip
+    from report_generator import create_pdf_report
+    from synthetic import SUMMARY
+
+    dataset = Dataset(frame)
+    zip_size = len(generate_graphs_zip(dataset, suggestions, SUMMARY).getvalue())
+    pdf_size = len(create_pdf_report(dataset, suggestions, SUMMARY).getvalue())
+    return {
+        "dataset_build": _measure(lambda: Dataset(frame), repeat),
+        "generate_graphs_zip": {**_measure(lambda: generate_graphs_zip(dataset, suggestions, SUMMARY), repeat),
+                                "bytes": zip_size},
+        "create_pdf_report": {**_measure(lambda: create_pdf_report(dataset, suggestions, SUMMARY), repeat),
+                              "bytes": pdf_size},
+    }
+
+
+async def _endpoint(client, path: str, body: bytes, requests: int, concurrency: int) -> dict:
+    headers = {"content-type": "application/json"}
+
+    async def call():
+        start = time.perf_counter()
+        response = await client.post(path, content=body, headers=headers)
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} returned {response.status_code}: {response.text[:200]}")
+        return time.perf_counter() - start
+
+    latency = [await call() for _ in range(requests)]
+
+    slots = asyncio.Semaphore(concurrency)
+
+    async def bounded():
+        async with slots:
+            return await call()
+
+    start = time.perf_counter()
+    concurrent = await asyncio.gather(*(bounded() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "latency": _timings(latency),
+        "concurrent_latency": _timings(list(concurrent)),
+        "concurrency": concurrency,
+        "throughput_rps": round(requests / elapsed, 3),
+    }
+
+
+def bench_endpoints(frame, requests: int, concurrency: int) -> dict:
+    import httpx
+
+    import main
+
+    records = json.loads(frame.to_json(orient="records"))
+    graphs_body = json.dumps({"data": records}).encode()
+    report_body = json.dumps({"data": records, "notes": "Which branches and products drive revenue?"}).encode()
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            return {
+                "payload_bytes": len(graphs_body),
+                "generate_graphs": await _endpoint(client, "/generate-graphs", graphs_body, requests, concurrency),
+                "generate_report": await _endpoint(client, "/generate-report", report_body, requests, concurrency),
+            }
+
+    return asyncio.run(run())
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _flatten(tree, prefix=""):
+    if isinstance(tree, dict):
+        for key, value in tree.items():
+            yield from _flatten(value, f"{prefix}/{key}" if prefix else key)
+    elif isinstance(tree, (int, float)) and prefix.endswith(("median_ms", "throughput_rps", "bytes")):
+        yield prefix, tree
+
+
+def compare(baseline: dict, current: dict):
+    """Print every median / throughput / size that changed against a baseline result file"""
+    before = dict(_flatten(baseline["results"]))
+    print(f"\nChanges against {baseline['meta'].get('revision', '?')} (negative is faster / smaller, "
+          f"except throughput):")
+    for name, value in _flatten(current["results"]):
+        old = before.get(name)
+        if not old:
+            continue
+        change = (value - old) / old * 100
+        print(f"  {name:<80} {old:>12} -> {value:<12} {change:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--shapes", default="sales,stock,wide", help="comma-separated dataset shapes")
+    parser.add_argument("--sizes", default="1000,10000", help="comma-separated row counts")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement")
+    parser.add_argument("--requests", type=int, default=6, help="requests per endpoint measurement")
+    parser.add_argument("--concurrency", type=int, default=3, help="concurrent requests for the throughput run")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds the stubbed LLM takes per call")
+    parser.add_argument("--skip", default="", help="comma-separated sections to skip: charts,outputs,endpoints")
+    parser.add_argument("--with-caches", action="store_true", help="keep the chart and LLM caches enabled")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    if not args.with_caches:
+        _disable_caches()
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+    from concurrency import shutdown_executors
+    from config import RENDER_PROCESSES
+    from synthetic import SUGGESTIONS, dataset, install_stub
+
+    skip = set(filter(None, args.skip.split(",")))
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = {}
+    try:
+        # Warm the render pool so the first measurement does not pay for process start-up
+        install_stub("sales")
+        bench_outputs(dataset("sales", 200), SUGGESTIONS["sales"], 1)
+
+        for shape in args.shapes.split(","):
+            install_stub(shape, args.llm_latency)
+            for rows in sizes:
+                frame = dataset(shape, rows)
+                print(f"{shape} x {rows} rows...", file=sys.stderr)
+                entry = results.setdefault(shape, {})[str(rows)] = {}
+                if "charts" not in skip:
+                    entry["charts"] = bench_charts(frame, SUGGESTIONS[shape], args.repeat)
+                if "outputs" not in skip:
+                    entry.update(bench_outputs(frame, SUGGESTIONS[shape], args.repeat))
+                if "endpoints" not in skip:
+                    entry["endpoints"] = bench_endpoints(frame, args.requests, args.concurrency)
+    finally:
+        shutdown_executors()
+
+    report = {
+        "meta": {
+            "revision": _git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "render_processes": RENDER_PROCESSES,
+            "caches": args.with_caches,
+            "llm_latency_s": args.llm_latency,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Synthetic datasets and a stubbed LLM for the benchmarks.
+
+Datasets are deterministic (seeded) so results are comparable between runs:
+
+- sales: branch / product / quantity / total / date, like the example uploads
+- stock: symbol / date / open / close / volume time series
+- wide: many numeric columns (heatmaps, correlation-heavy profiling)
+
+Each shape comes with a fixed suggestion set that the stubbed LLM returns,
+so every run renders the same charts.
+"""
+import numpy as np
+import pandas as pd
+
+
+def sales_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    quantity = rng.integers(1, 20, rows)
+    return pd.DataFrame({
+        "branch": rng.choice(["North", "South", "East", "West", "Central"], rows),
+        "product": rng.choice([f"P{i:02d}" for i in range(30)], rows),
+        "quantity": quantity,
+        "total": (quantity * rng.gamma(2.0, 12.0, rows)).round(2),
+        "date": pd.date_range("2023-01-01", periods=rows, freq="h").strftime("%Y-%m-%d %H:%M"),
+    })
+
+
+def stock_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(1)
+    symbols = ["ACME", "GLOBX", "INITECH", "UMBR", "WAYNE", "STARK", "HOOLI", "VAND"]
+    symbol = rng.choice(symbols, rows)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+    return pd.DataFrame({
+        "symbol": symbol,
+        "date": pd.date_range("2015-01-01", periods=rows, freq="min").strftime("%Y-%m-%d %H:%M"),
+        "open": (close * (1 + rng.normal(0, 0.002, rows))).round(2),
+        "close": close.round(2),
+        "volume": rng.integers(1_000, 1_000_000, rows),
+    })
+
+
+def wide_frame(rows: int, columns: int = 30) -> pd.DataFrame:
+    rng = np.random.default_rng(2)
+    base = rng.normal(size=(rows, 1))
+    values = base + rng.normal(scale=rng.uniform(0.2, 3.0, columns), size=(rows, columns))
+    frame = pd.DataFrame(values.round(4), columns=[f"m{i:02d}" for i in range(columns)])
+    frame.insert(0, "segment", rng.choice(["a", "b", "c", "d"], rows))
+    return frame
+
+
+SUGGESTIONS = {
+    "sales": [
+        {"type": "bar", "x": "branch", "y": "total", "title": "Revenue by Branch"},
+        {"type": "line", "x": "date", "y": "total", "title": "Revenue over Time"},
+        {"type": "area", "x": "date", "y": "quantity", "title": "Units over Time"},
+        {"type": "scatter", "x": "quantity", "y": "total", "title": "Quantity vs Revenue"},
+        {"type": "bubble", "x": "quantity", "y": "total", "size": "quantity", "title": "Order Sizes"},
+        {"type": "pie", "labels": "branch", "values": "total", "title": "Revenue Share"},
+        {"type": "box", "x": "branch", "y": "total", "title": "Order Value by Branch"},
+        {"type": "hist", "x": "total", "title": "Order Value Distribution"},
+        {"type": "heatmap", "title": "Correlations"},
+    ],
+    "stock": [
+        {"type": "line", "x": "date", "y": "close", "title": "Close Price"},
+        {"type": "area", "x": "date", "y": "volume", "title": "Traded Volume"},
+        {"type": "scatter", "x": "volume", "y": "close", "title": "Volume vs Close"},
+        {"type": "box", "x": "symbol", "y": "close", "title": "Close by Symbol"},
+        {"type": "bar", "x": "symbol", "y": "volume", "title": "Volume by Symbol"},
+        {"type": "hist", "x": "close", "title": "Close Distribution"},
+    ],
+    "wide": [
+        {"type": "heatmap", "title": "Correlation Matrix"},
+        {"type": "scatter", "x": "m00", "y": "m01", "title": "m00 vs m01"},
+        {"type": "box", "x": "segment", "y": "m02", "title": "m02 by Segment"},
+        {"type": "hist", "x": "m03", "title": "m03 Distribution"},
+    ],
+}
+
+SUMMARY = (
+    "Revenue grew steadily over the period, led by the North and Central branches. "
+    "We recommend expanding the best-selling products. Costs should be reviewed in the West branch."
+)
+
+DATASETS = {"sales": sales_frame, "stock": stock_frame, "wide": wide_frame}
+
+
+def dataset(shape: str, rows: int) -> pd.DataFrame:
+    return DATASETS[shape](rows)
+
+
+def install_stub(shape: str, latency: float = 0.0):
+    """
+    Answer every LLM prompt with the fixed suggestion set of `shape` after
+    `latency` seconds, through the local provider (see llm_providers.py)
+    """
+    import gemini
+    from llm_providers import LocalProvider
+
+    stub = LocalProvider(latency=latency, response={"suggestions": SUGGESTIONS[shape], "summary": SUMMARY})
+    gemini.provider = stub
+    return stub
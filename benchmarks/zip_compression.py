@@ -0,0 +1,103 @@
+"""
+Benchmark: ZIP compression policy for the charts archive.
+
+Renders a fixed set of charts once, then builds the archive repeatedly with
+every entry deflated (the old behaviour) and with the per-entry policy
+(PNG stored, text deflated), reporting CPU time, wall time and size. Also
+reports how much palette quantization shrinks the PNGs.
+
+    python benchmarks/zip_compression.py [--repeat 20] [--json out.json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from graph_gen import THEME_ZIP, optimize_png, render_png
+from zip_stream import entry_compression, stream_zip
+
+SUGGESTIONS = [
+    {"type": "bar", "x": "branch", "y": "total", "title": "Total by Branch"},
+    {"type": "line", "x": "day", "y": "total", "title": "Total over Time"},
+    {"type": "scatter", "x": "quantity", "y": "total", "title": "Quantity vs Total"},
+    {"type": "pie", "labels": "branch", "values": "total", "title": "Revenue Share"},
+    {"type": "hist", "x": "total", "title": "Order Size Distribution"},
+    {"type": "heatmap", "title": "Correlations"},
+]
+
+
+def sample_frame(rows: int = 500) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "branch": rng.choice(["A", "B", "C", "D"], rows),
+        "day": np.arange(rows),
+        "quantity": rng.integers(1, 10, rows),
+        "total": rng.gamma(2.0, 50.0, rows).round(2),
+    })
+
+
+def build(entries, compression) -> bytes:
+    return b"".join(stream_zip(iter(entries), compression=compression))
+
+
+def measure(entries, compression, repeat: int) -> dict:
+    build(entries, compression)  # warm-up
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    for _ in range(repeat):
+        archive = build(entries, compression)
+    cpu, wall = time.process_time() - cpu0, time.perf_counter() - wall0
+    return {
+        "cpu_ms_per_archive": round(cpu / repeat * 1000, 3),
+        "wall_ms_per_archive": round(wall / repeat * 1000, 3),
+        "archive_bytes": len(archive),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--colors", type=int, default=64, help="palette size for the quantization run")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    df = sample_frame()
+    pngs = [(f"chart_{i}.png", render_png(df, s, THEME_ZIP, dpi=100, index=i)) for i, s in enumerate(SUGGESTIONS)]
+    pngs = [(name, png) for name, png in pngs if png]
+    summary = "Revenue grew steadily across all branches. " * 40
+    entries = pngs + [("summary.txt", summary)]
+
+    results = {
+        "charts": len(pngs),
+        "png_bytes": sum(len(png) for _, png in pngs),
+        "all_deflated": measure(entries, lambda name: zipfile.ZIP_DEFLATED, args.repeat),
+        "per_entry_policy": measure(entries, entry_compression, args.repeat),
+    }
+
+    t0 = time.perf_counter()
+    quantized = [(name, optimize_png(png, args.colors)) for name, png in pngs]
+    results["palette_quantization"] = {
+        "colors": args.colors,
+        "ms_per_chart": round((time.perf_counter() - t0) / len(pngs) * 1000, 3),
+        "png_bytes": sum(len(png) for _, png in quantized),
+        "archive": measure(quantized + [("summary.txt", summary)], entry_compression, args.repeat),
+    }
+
+    before, after = results["all_deflated"], results["per_entry_policy"]
+    results["cpu_ms_saved_per_archive"] = round(before["cpu_ms_per_archive"] - after["cpu_ms_per_archive"], 3)
+    results["wall_ms_saved_per_archive"] = round(before["wall_ms_per_archive"] - after["wall_ms_per_archive"], 3)
+
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Content-addressed cache for rendered chart images (PNG or SVG bytes).
+
+Keys are a stable hash of the DataFrame columns a chart reads, the
+render-relevant fields of its suggestion, and the theme/dpi. A bounded
+in-memory LRU tier sits in front of an optional on-disk tier with size-based
+eviction, so a cache hit never touches matplotlib.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import pandas as pd
+
+from config import CHART_CACHE_DIR, CHART_CACHE_DISK_MB, CHART_CACHE_MEMORY_MB
+
+logger = logging.getLogger(__name__)
+
+# Suggestion fields that change the rendered image ("insight" does not)
+RENDER_KEYS = ("type", "title", "x", "y", "labels", "values", "size")
+# Image formats of the entries; each is stored on disk with its own suffix
+IMAGE_FORMATS = ("png", "svg")
+
+
+def column_digest(series: pd.Series) -> str:
+    """Hash one column's name, dtype and values"""
+    h = hashlib.sha256()
+    h.update(str(series.name).encode())
+    h.update(str(series.dtype).encode())
+    h.update(pd.util.hash_pandas_object(series, index=False).values.tobytes())
+    return h.hexdigest()
+
+
+def chart_key(df: pd.DataFrame, chart_config: dict, theme: str, dpi: int, digests: Optional[dict] = None, palette: int = 0,
+              density: bool = False, fmt: str = "png") -> Optional[str]:
+    """
+    Build the cache key for one chart
+
+    Args:
+        df: DataFrame holding only the columns the chart reads
+        chart_config: Chart suggestion
+        theme: Render theme
+        dpi: Output resolution
+        digests: Optional per-request memo of column digests
+        palette: Palette size the PNG was quantized to (0 = not quantized)
+        density: Whether a scatter/bubble chart is drawn as a density grid
+        fmt: Image format ("png" or "svg")
+
+    Returns:
+        str: hex key, or None if the data cannot be hashed (e.g. unhashable cells)
+    """
+    if digests is None:
+        digests = {}
+    h = hashlib.sha256()
+    try:
+        for col in df.columns:
+            if col not in digests:
+                digests[col] = column_digest(df[col])
+            h.update(digests[col].encode())
+    except TypeError:
+        return None
+    normalized = {k: chart_config[k] for k in RENDER_KEYS if chart_config.get(k) is not None}
+    h.update(json.dumps(normalized, sort_keys=True, default=str).encode())
+    h.update(f"{theme}:{dpi}:{palette}:{int(density)}:{fmt}".encode())
+    return h.hexdigest()
+
+
+class ChartCache:
+    def __init__(self, memory_bytes: int, disk_dir: str = "", disk_bytes: int = 0):
+        self.memory_bytes = memory_bytes
+        self.disk_dir = disk_dir
+        self.disk_bytes = disk_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._disk_size = None  # computed lazily on the first disk write
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.memory_evictions = 0
+        self.disk_evictions = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def get(self, key: str, fmt: str = "png") -> Optional[bytes]:
+        """Cached image of a chart_key() built with the same fmt, or None"""
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return image
+
+        image = self._disk_get(key, fmt)
+        with self._lock:
+            if image is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._memory_put(key, image)
+        return image
+
+    def put(self, key: str, image: bytes, fmt: str = "png"):
+        self._memory_put(key, image)
+        self._disk_put(key, image, fmt)
+
+    def _memory_put(self, key: str, image: bytes):
+        if len(image) > self.memory_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = image
+            self._size += len(image)
+            while self._size > self.memory_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.memory_evictions += 1
+
+    def _path(self, key: str, fmt: str) -> str:
+        if fmt not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported chart image format: {fmt}")
+        return os.path.join(self.disk_dir, f"{key}.{fmt}")
+
+    def _disk_get(self, key: str, fmt: str) -> Optional[bytes]:
+        if not self.disk_dir:
+            return None
+        path = self._path(key, fmt)
+        try:
+            with open(path, "rb") as f:
+                image = f.read()
+            os.utime(path)  # refresh mtime so eviction approximates LRU
+            return image
+        except OSError:
+            return None
+
+    def _disk_put(self, key: str, image: bytes, fmt: str):
+        if not self.disk_dir or len(image) > self.disk_bytes:
+            return
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(image)
+            os.replace(tmp_path, self._path(key, fmt))
+        except OSError as e:
+            logger.warning(f"Could not write chart cache entry: {e}")
+            return
+        with self._lock:
+            if self._disk_size is None:
+                self._disk_size = self._scan_disk_size()
+            else:
+                self._disk_size += len(image)
+            if self._disk_size > self.disk_bytes:
+                self._evict_disk()
+
+    def _disk_files(self):
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith(tuple(f".{fmt}" for fmt in IMAGE_FORMATS)):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, entry.path))
+        return files
+
+    def _scan_disk_size(self) -> int:
+        return sum(size for _, size, _ in self._disk_files())
+
+    def _evict_disk(self):
+        """Delete least recently used files until the tier is back under 90% of its budget"""
+        files = sorted(self._disk_files())
+        total = sum(size for _, size, _ in files)
+        target = int(self.disk_bytes * 0.9)
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                self.disk_evictions += 1
+            except OSError:
+                pass
+        self._disk_size = total
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_evictions": self.memory_evictions,
+                "disk_evictions": self.disk_evictions,
+                "memory_entries": len(self._entries),
+                "memory_bytes": self._size,
+                "disk_enabled": bool(self.disk_dir),
+            }
+
+
+chart_cache = ChartCache(
+    memory_bytes=CHART_CACHE_MEMORY_MB * 1024 * 1024,
+    disk_dir=CHART_CACHE_DIR,
+    disk_bytes=CHART_CACHE_DISK_MB * 1024 * 1024,
+)
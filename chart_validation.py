@@ -0,0 +1,236 @@
+"""
+Check LLM chart suggestions against the dataset before they are rendered.
+
+LLM suggestions name columns that are misspelled, differ in case or
+punctuation, or do not exist, and pair chart types with columns they
+cannot draw (text on a line chart's y axis). Such charts fail inside
+matplotlib, after the figure was built, and still cost a rendered "Error
+creating chart" image. ChartValidator sits between parsing and rendering:
+
+- column names (x, y, labels, values, size) are resolved exactly, then
+  ignoring case, spaces and punctuation, then by fuzzy match (difflib)
+- chart type names are normalised ("Bar Chart", "histogram", "donut")
+- each chart type needs columns of a compatible kind: numeric y for
+  bar/line/area/scatter/box, categorical x for box, numeric x for hist,
+  non-negative totals for pie, two numeric columns for heatmap
+- repairs where the intent is clear: pie given x/y instead of labels/values,
+  hist given only y, bar/box with x and y the wrong way round, bubble
+  without a usable size drawn as a scatter
+- anything still undrawable is dropped, with the reason logged
+"""
+import difflib
+import logging
+import re
+from typing import Optional
+
+import pandas as pd
+
+from dataset import as_dataset
+from recommender import MAX_CATEGORIES
+
+logger = logging.getLogger(__name__)
+
+# Lowest difflib similarity accepted for a misspelled column name
+FUZZY_CUTOFF = 0.8
+
+CHART_TYPES = ("bar", "line", "scatter", "pie", "hist", "area", "box", "heatmap", "bubble")
+TYPE_ALIASES = {
+    "histogram": "hist", "distribution": "hist",
+    "column": "bar", "barh": "bar", "horizontalbar": "bar", "stackedbar": "bar",
+    "lines": "line", "timeseries": "line",
+    "point": "scatter", "dot": "scatter",
+    "donut": "pie", "doughnut": "pie",
+    "boxwhisker": "box", "boxandwhisker": "box", "boxwhiskers": "box",
+    "stackedarea": "area",
+    "correlation": "heatmap", "correlationmatrix": "heatmap", "heat": "heatmap",
+}
+
+# Kinds of column a chart field accepts
+ANY, NUMERIC, ORDERED, CATEGORICAL = "any", "numeric", "numeric or date", "categorical"
+# Fields each chart type reads (generate_chart / create_zip_chart) and the kind each needs
+FIELDS = {
+    "bar": {"x": ANY, "y": NUMERIC},
+    "line": {"x": ANY, "y": NUMERIC},
+    "area": {"x": ORDERED, "y": NUMERIC},
+    "scatter": {"x": ANY, "y": NUMERIC},
+    "bubble": {"x": ANY, "y": NUMERIC, "size": NUMERIC},
+    "hist": {"x": NUMERIC},
+    "box": {"x": CATEGORICAL, "y": NUMERIC},
+    "pie": {"labels": ANY, "values": NUMERIC},
+    "heatmap": {},
+}
+COLUMN_FIELDS = ("x", "y", "labels", "values", "size")
+
+
+def _normalize(name: str) -> str:
+    return re.sub(r"[^0-9a-z]+", "", name.lower())
+
+
+class ColumnIndex:
+    """Resolves column names as an LLM writes them to the dataset's columns"""
+
+    def __init__(self, columns):
+        self.exact = {str(col): col for col in columns}
+        self.normalized = {}
+        for col in columns:
+            self.normalized.setdefault(_normalize(str(col)), col)
+
+    def resolve(self, name) -> Optional[object]:
+        """
+        The column meant by `name`
+
+        Returns:
+            the column, or None when nothing matches closely enough
+        """
+        if isinstance(name, list):  # several columns for one field: the first one that exists
+            return next((col for col in map(self.resolve, name) if col is not None), None)
+        if not isinstance(name, str) or not name.strip():
+            return None
+        if name in self.exact:
+            return self.exact[name]
+        key = _normalize(name)
+        if key in self.normalized:
+            return self.normalized[key]
+        match = difflib.get_close_matches(key, list(self.normalized), n=1, cutoff=FUZZY_CUTOFF)
+        return self.normalized[match[0]] if match else None
+
+
+def chart_type(name) -> Optional[str]:
+    """Canonical chart type for a type name ("line" when missing, None when unknown)"""
+    if name is None:
+        return "line"  # the renderers' default
+    if not isinstance(name, str):
+        return None
+    key = re.sub(r"(chart|plot|graph|diagram)s?$", "", _normalize(name)) or _normalize(name)
+    key = TYPE_ALIASES.get(key, key)
+    return key if key in CHART_TYPES else None
+
+
+class ChartValidator:
+    """
+    Validates and repairs suggestions for one dataset
+
+    Build it once per dataset and call validate() per suggestion (streamed
+    suggestions) or validate_all() on a parsed answer.
+    """
+
+    def __init__(self, data):
+        self.dataset = as_dataset(data)
+        self.index = ColumnIndex(self.dataset.columns)
+
+    def kind_ok(self, col, kind: str) -> bool:
+        dataset = self.dataset
+        series = dataset.frame[col]
+        numeric = pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+        if kind == NUMERIC:
+            return numeric
+        if kind == ORDERED:
+            return numeric or col in dataset.dates
+        if kind == CATEGORICAL:
+            unique = dataset.unique_counts[col]
+            return not numeric or (unique is not None and unique <= MAX_CATEGORIES)
+        return True
+
+    def _has_values(self, col) -> bool:
+        return bool(self.dataset.unique_counts[col])  # None (unhashable cells) or 0 (all empty)
+
+    def check(self, suggestion: dict) -> tuple[Optional[dict], list[str]]:
+        """
+        Validate one suggestion
+
+        Returns:
+            (repaired copy, or None when it cannot be drawn; notes on the repairs
+            made, or the reason it was dropped)
+        """
+        notes = []
+        gtype = chart_type(suggestion.get("type"))
+        if gtype is None:
+            return None, [f"unknown chart type {suggestion.get('type')!r}"]
+        chart = dict(suggestion, type=gtype)
+        if gtype != suggestion.get("type"):
+            notes.append(f"type {suggestion.get('type')!r} -> {gtype!r}")
+
+        if gtype == "heatmap":
+            if self.dataset.numeric.shape[1] < 2:
+                return None, ["heatmap needs at least two numeric columns"]
+            return chart, notes
+
+        columns = {}
+        for field in COLUMN_FIELDS:
+            if field not in chart:
+                continue
+            col = self.index.resolve(chart[field])
+            if col is not None and self._has_values(col):
+                columns[field] = col
+                if col != chart[field]:
+                    notes.append(f"{field} {chart[field]!r} -> {col!r}")
+            else:
+                if field in FIELDS[gtype]:
+                    notes.append(f"{field} {chart[field]!r} is not a usable column")
+                del chart[field]
+
+        if gtype == "pie":
+            for field, fallback in (("labels", "x"), ("values", "y")):
+                if field not in columns and fallback in columns:
+                    columns[field] = columns[fallback]
+                    notes.append(f"{field} taken from {fallback}")
+        elif gtype == "hist" and not ("x" in columns and self.kind_ok(columns["x"], NUMERIC)) \
+                and "y" in columns and self.kind_ok(columns["y"], NUMERIC):
+            columns["x"] = columns["y"]
+            notes.append("hist of y instead of x")
+        elif gtype in ("bar", "box") and "x" in columns and "y" in columns \
+                and not self.kind_ok(columns["y"], NUMERIC) and self.kind_ok(columns["x"], NUMERIC) \
+                and self.kind_ok(columns["y"], FIELDS[gtype]["x"]):
+            columns["x"], columns["y"] = columns["y"], columns["x"]
+            notes.append("x and y swapped")
+        if gtype == "bubble" and not ("size" in columns and self.kind_ok(columns["size"], NUMERIC)):
+            gtype = chart["type"] = "scatter"
+            notes.append("drawn as scatter without a numeric size")
+
+        for field, kind in FIELDS[gtype].items():
+            col = columns.get(field)
+            if col is None:
+                return None, notes + [f"{gtype} needs {field}"]
+            if not self.kind_ok(col, kind):
+                return None, notes + [f"{gtype} needs a {kind} {field}, {col!r} is not"]
+
+        if gtype == "pie":
+            totals = self.dataset.frame.groupby(columns["labels"])[columns["values"]].sum()
+            if (totals < 0).any() or not totals.sum() > 0:
+                return None, notes + [f"pie needs positive totals of {columns['values']!r}"]
+
+        chart.update(columns)
+        return chart, notes
+
+    def validate(self, suggestion) -> Optional[dict]:
+        """Repaired copy of a suggestion, or None (logged) when it cannot be drawn"""
+        if not isinstance(suggestion, dict):
+            return None
+        chart, notes = self.check(suggestion)
+        title = suggestion.get("title", "Untitled Chart")
+        if chart is None:
+            logger.warning(f"Dropped chart suggestion {title!r}: {'; '.join(notes)}")
+        elif notes:
+            logger.info(f"Repaired chart suggestion {title!r}: {'; '.join(notes)}")
+        return chart
+
+    def validate_all(self, suggestions) -> list[dict]:
+        """The drawable suggestions, repaired, in their original order"""
+        if not isinstance(suggestions, list):
+            return []
+        return [chart for chart in map(self.validate, suggestions) if chart is not None]
+
+
+def validate_suggestions(data, suggestions) -> list[dict]:
+    """
+    Validate and repair chart suggestions against a dataset
+
+    Args:
+        data: Dataset (or DataFrame / list of row dicts) the charts are drawn from
+        suggestions: Parsed suggestions (e.g. extract_response_parts()["suggestions"])
+
+    Returns:
+        list[dict]: the suggestions that can be drawn, with column names and
+        chart types corrected
+    """
+    return ChartValidator(data).validate_all(suggestions)
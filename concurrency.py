@@ -0,0 +1,122 @@
+"""Executors that keep blocking work off the asyncio event loop."""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from config import BATCH_REPORT_WORKERS, LLM_MAX_CONCURRENCY, RENDER_MAX_WORKERS, UPLOAD_MAX_WORKERS
+
+# Dedicated pool for chart rendering and PDF assembly, created on first use
+# (and again after a shutdown, e.g. when the app is restarted in-process)
+_render_executor = None
+_render_executor_lock = threading.Lock()
+
+# Pool decoding uploads and building Datasets, created on first use; kept apart
+# from the render pool so a request is not queued behind whole PDF builds
+_upload_executor = None
+_upload_executor_lock = threading.Lock()
+
+# Shared pool building the partition reports of all batch requests, created on first use
+_batch_executor = None
+_batch_executor_lock = threading.Lock()
+
+# Bounds concurrent upstream LLM calls so a burst of requests cannot exhaust the quota
+_llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+
+def get_render_executor() -> ThreadPoolExecutor:
+    global _render_executor
+    with _render_executor_lock:
+        if _render_executor is None:
+            _render_executor = ThreadPoolExecutor(max_workers=RENDER_MAX_WORKERS, thread_name_prefix="render")
+        return _render_executor
+
+
+def get_upload_executor() -> ThreadPoolExecutor:
+    global _upload_executor
+    with _upload_executor_lock:
+        if _upload_executor is None:
+            _upload_executor = ThreadPoolExecutor(max_workers=UPLOAD_MAX_WORKERS, thread_name_prefix="upload")
+        return _upload_executor
+
+
+def get_batch_executor() -> ThreadPoolExecutor:
+    """Pool for batch partition reports: BATCH_REPORT_WORKERS threads across all requests"""
+    global _batch_executor
+    with _batch_executor_lock:
+        if _batch_executor is None:
+            _batch_executor = ThreadPoolExecutor(max_workers=BATCH_REPORT_WORKERS, thread_name_prefix="batch-report")
+        return _batch_executor
+
+
+async def run_in_render_executor(func, *args, **kwargs):
+    """
+    Run a blocking render function in the render pool and await its result
+
+    The function runs in a copy of the caller's context, so request-scoped
+    state (e.g. the Server-Timing stages in metrics.py) reaches the worker thread.
+    """
+    return await _run_in(get_render_executor(), func, *args, **kwargs)
+
+
+async def run_in_upload_executor(func, *args, **kwargs):
+    """Like run_in_render_executor, in the upload pool (decoding uploads, building Datasets)"""
+    return await _run_in(get_upload_executor(), func, *args, **kwargs)
+
+
+async def _run_in(executor: ThreadPoolExecutor, func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(executor, functools.partial(ctx.run, func, *args, **kwargs))
+
+
+async def iterate_in_render_executor(iterator):
+    """
+    Drive a blocking iterator (e.g. a chart stream) from the render pool
+
+    Each next() runs in the render executor, so the event loop stays free
+    while items are being produced. Like run_in_render_executor, each step
+    runs in the caller's context.
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_render_executor()
+    ctx = contextvars.copy_context()
+    done = object()
+    try:
+        while True:
+            item = await loop.run_in_executor(executor, ctx.run, next, iterator, done)
+            if item is done:
+                break
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            await loop.run_in_executor(executor, close)
+
+
+@asynccontextmanager
+async def llm_slot():
+    """Wait for a free LLM slot; hold it for the duration of the block"""
+    async with _llm_semaphore:
+        yield
+
+
+def shutdown_executors():
+    global _render_executor, _upload_executor, _batch_executor
+    from render_engine import shutdown_pool
+
+    with _render_executor_lock:
+        executor, _render_executor = _render_executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+    with _upload_executor_lock:
+        executor, _upload_executor = _upload_executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+    with _batch_executor_lock:
+        executor, _batch_executor = _batch_executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+    shutdown_pool()
@@ -0,0 +1,82 @@
+"""Runtime settings, read once from the environment (or a local .env file)."""
+import os
+
+from dotenv import load_dotenv
+load_dotenv()
+
+
+def _int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Environment variable {name} must be an integer, got {value!r}")
+
+
+# Maximum number of Gemini calls allowed in flight at once (per worker process)
+LLM_MAX_CONCURRENCY = max(1, _int("LLM_MAX_CONCURRENCY", 4))
+
+# Threads used for matplotlib / ReportLab work. Charts are drawn on standalone
+# Figure/Agg canvases (no pyplot state), so these threads can render concurrently.
+RENDER_MAX_WORKERS = max(1, _int("RENDER_MAX_WORKERS", 4))
+
+# Threads decoding uploads and building Datasets, apart from the render threads
+# so a new request never waits for PDF assembly to free one.
+UPLOAD_MAX_WORKERS = max(1, _int("UPLOAD_MAX_WORKERS", 2))
+
+# Worker processes in the chart rendering pool. 0 renders in-process instead.
+RENDER_PROCESSES = max(0, _int("RENDER_PROCESSES", min(4, os.cpu_count() or 1)))
+
+# Rendered chart cache: in-memory LRU budget, plus an optional on-disk tier
+# that is enabled by pointing CHART_CACHE_DIR at a writable directory.
+CHART_CACHE_MEMORY_MB = max(0, _int("CHART_CACHE_MEMORY_MB", 64))
+CHART_CACHE_DIR = os.getenv("CHART_CACHE_DIR", "")
+CHART_CACHE_DISK_MB = max(0, _int("CHART_CACHE_DISK_MB", 512))
+
+# Parsed LLM responses are cached per (prompt kind, data, notes)
+LLM_CACHE_MAX_ENTRIES = max(0, _int("LLM_CACHE_MAX_ENTRIES", 256))
+LLM_CACHE_TTL_SECONDS = max(0, _int("LLM_CACHE_TTL_SECONDS", 3600))
+
+# Palette-quantize zip PNGs to this many colours (0 keeps full RGBA output).
+# Our charts use a small indigo palette, so 64-128 colours is usually lossless to the eye.
+PNG_PALETTE_COLORS = max(0, min(256, _int("PNG_PALETTE_COLORS", 0)))
+
+# Scatter/bubble charts with more rows than this are drawn as a binned 2D density image
+SCATTER_DENSITY_THRESHOLD = max(0, _int("SCATTER_DENSITY_THRESHOLD", 50000))
+
+# Embed PDF report charts as vector drawings (svglib, pinned in requirements.txt to a version that works with reportlab 4.3).
+# Heatmaps, density charts and point charts (scatter, bubble, line, area) with more
+# than VECTOR_MAX_MARKERS rows stay PNG: their drawings would be bigger and slower.
+PDF_VECTOR_CHARTS = _int("PDF_VECTOR_CHARTS", 0) > 0
+VECTOR_MAX_MARKERS = max(0, _int("VECTOR_MAX_MARKERS", 200))
+
+# Finished PDF reports up to this size are kept in memory; bigger ones spill to a temp file
+PDF_SPOOL_MEMORY_MB = max(0, _int("PDF_SPOOL_MEMORY_MB", 8))
+
+# Background jobs: concurrent job workers, queue bound, and how long finished jobs are kept
+JOB_WORKERS = max(1, _int("JOB_WORKERS", 2))
+JOB_MAX_QUEUED = max(1, _int("JOB_MAX_QUEUED", 100))
+JOB_TTL_SECONDS = max(0, _int("JOB_TTL_SECONDS", 3600))
+# Finished job results kept at once (each in a spooled temp file, see PDF_SPOOL_MEMORY_MB);
+# beyond it the oldest finished job is dropped
+JOB_MAX_RESULTS = max(1, _int("JOB_MAX_RESULTS", 50))
+
+# Batch reports: most partitions per upload, partitions described per LLM prompt,
+# and partition reports built at once
+BATCH_MAX_PARTITIONS = max(1, _int("BATCH_MAX_PARTITIONS", 200))
+BATCH_PROMPT_PARTITIONS = max(1, _int("BATCH_PROMPT_PARTITIONS", 8))
+BATCH_REPORT_WORKERS = max(1, _int("BATCH_REPORT_WORKERS", 4))
+
+# LLM backend: "gemini", or "local" for the offline backend (load tests, benchmarks, CI).
+# The local backend answers with the {"suggestions", "summary"} JSON in LOCAL_LLM_RESPONSE_FILE,
+# or with charts picked from the dataset schema, after LOCAL_LLM_LATENCY_MS.
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini").strip().lower()
+LOCAL_LLM_RESPONSE_FILE = os.getenv("LOCAL_LLM_RESPONSE_FILE", "")
+LOCAL_LLM_LATENCY_MS = max(0, _int("LOCAL_LLM_LATENCY_MS", 0))
+
+# Give up on the LLM after this many seconds (0 waits as long as it takes). When it times
+# out or fails, LLM_FALLBACK_PROVIDER (e.g. "local") answers instead; its answers are not cached.
+LLM_TIMEOUT_SECONDS = max(0, _int("LLM_TIMEOUT_SECONDS", 0))
+LLM_FALLBACK_PROVIDER = os.getenv("LLM_FALLBACK_PROVIDER", "").strip().lower()
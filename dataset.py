@@ -0,0 +1,126 @@
+"""
+Request-scoped dataset shared by the LLM, chart and PDF stages.
+
+The DataFrame is built once and date columns are parsed up front. Column
+types are taken as the upload gives them: typed sources (JSON, Arrow,
+Parquet) are not second-guessed, so strings such as zip codes or ids stay
+text; CSV types are inferred when the upload is read (see uploads.py). Derived views (numeric subset, correlation
+matrix, unique counts, content hashes) are computed on first use and reused
+by every later stage.
+"""
+import hashlib
+import warnings
+from functools import cached_property
+
+import pandas as pd
+
+
+def parse_dates(series: pd.Series):
+    """
+    Parse a text column as dates
+
+    Returns:
+        Series of datetimes, or None when the column does not look like dates
+    """
+    if series.dtype != object:
+        return None
+    probe = series.dropna().head(50)
+    if probe.empty or pd.to_numeric(probe, errors="coerce").notna().all():
+        return None
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        if pd.to_datetime(probe, errors="coerce", format="mixed").notna().mean() < 0.9:
+            return None
+        return pd.to_datetime(series, errors="coerce", format="mixed")
+
+
+def frame_fingerprint(frame: pd.DataFrame) -> str:
+    """Content hash of a DataFrame (column names, dtypes and values)"""
+    h = hashlib.sha256(repr([(str(c), str(t)) for c, t in frame.dtypes.items()]).encode())
+    try:
+        h.update(pd.util.hash_pandas_object(frame, index=False).values.tobytes())
+    except TypeError:  # unhashable cells
+        h.update(frame.to_json(orient="split", default_handler=str).encode())
+    return h.hexdigest()
+
+
+class Dataset:
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+        self.dates = {}  # column -> parsed datetime Series
+        for col in self.frame.columns:
+            series = self.frame[col]
+            if pd.api.types.is_datetime64_any_dtype(series):
+                self.dates[col] = series
+            else:
+                parsed = parse_dates(series)
+                if parsed is not None:
+                    self.dates[col] = parsed
+        # Per-column digests, filled in by the chart cache as charts are keyed
+        self.column_digests = {}
+
+    @classmethod
+    def from_records(cls, records: list[dict]) -> "Dataset":
+        return cls(pd.DataFrame(records))
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def columns(self):
+        return self.frame.columns
+
+    def _subset(self, positions) -> "Dataset":
+        """Rows at the given positions, reusing the parsed dates instead of parsing again"""
+        subset = Dataset.__new__(Dataset)
+        subset.frame = self.frame.iloc[positions].reset_index(drop=True)
+        subset.dates = {col: dates.iloc[positions].reset_index(drop=True) for col, dates in self.dates.items()}
+        subset.column_digests = {}
+        return subset
+
+    def partitions(self, column) -> list:
+        """
+        Split the rows by the values of a column, in first-seen order
+
+        Returns:
+            list of (value, Dataset)
+        """
+        groups = self.frame.groupby(column, sort=False, dropna=False).indices
+        return [(value, self._subset(positions)) for value, positions in groups.items()]
+
+    def schema(self) -> tuple:
+        """Names and dtypes of the columns that hold at least one value"""
+        present = self.frame.notna().any()
+        return tuple((str(col), str(dtype)) for col, dtype in self.frame.dtypes.items() if present[col])
+
+    @cached_property
+    def numeric(self) -> pd.DataFrame:
+        return self.frame.select_dtypes(include='number')
+
+    @cached_property
+    def corr(self) -> pd.DataFrame:
+        return self.numeric.corr()
+
+    @cached_property
+    def unique_counts(self) -> dict:
+        """Column -> number of distinct values (None for unhashable columns)"""
+        counts = {}
+        for col in self.frame.columns:
+            try:
+                counts[col] = int(self.frame[col].nunique())
+            except TypeError:
+                counts[col] = None
+        return counts
+
+    @cached_property
+    def fingerprint(self) -> str:
+        return frame_fingerprint(self.frame)
+
+
+def as_dataset(data) -> Dataset:
+    """Accept a Dataset, a DataFrame or a list of row dicts"""
+    if isinstance(data, Dataset):
+        return data
+    if isinstance(data, pd.DataFrame):
+        return Dataset(data)
+    return Dataset.from_records(data)
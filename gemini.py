@@ -1,49 +1,68 @@
-import google.generativeai as genai
-import os
+import asyncio
 import json
-import re
 
-from dotenv import load_dotenv
-load_dotenv()
+import pandas as pd
 
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+from concurrency import llm_slot, run_in_render_executor
+from config import BATCH_PROMPT_PARTITIONS, LLM_FALLBACK_PROVIDER, LLM_PROVIDER, LLM_TIMEOUT_SECONDS
+from dataset import Dataset, as_dataset
+from json_stream import SuggestionStream, parse_response
+from llm_cache import llm_cache, request_key
+from llm_providers import LLMProvider, make_provider
+from metrics import timed
+from profiling import profile_dataset
 
-model = genai.GenerativeModel(model_name="gemini-1.5-flash-latest")
+# Backend answering the prompts (see llm_providers.py); replace it to stub the LLM out
+provider: LLMProvider = make_provider(LLM_PROVIDER)
+# Answers instead when the provider times out or fails (None: the error propagates)
+fallback_provider = make_provider(LLM_FALLBACK_PROVIDER) if LLM_FALLBACK_PROVIDER else None
 
 
 def extract_response_parts(response_text: str) -> dict:
-    try:
-        # Match a full JSON object
-        match = re.search(r"\{.*\}", response_text, re.DOTALL)
-        if not match:
-            raise ValueError("No valid JSON object found in response.")
-
-        response_json = json.loads(match.group())
-
-        suggestions = response_json.get("suggestions", [])
-        summary = response_json.get("summary", "No summary provided.")
-
-        return {
-            "suggestions": suggestions,
-            "summary": summary
-        }
+    """
+    {"suggestions", "summary"} from an LLM answer; prose around the JSON and a
+    truncated tail are tolerated (see json_stream.py)
 
-    except Exception as e:
-        print(f"Failed to extract structured response: {e}")
+    "summary" is left out when the answer has none, and answers that were cut
+    off and repaired are marked "repaired"; neither is cached (see
+    llm_cache.is_usable_response).
+    """
+    parser = SuggestionStream()
+    parser.feed(response_text)
+    rest, response_json = parser.finish()
+    if response_json is None:
+        print("Failed to extract structured response: no valid JSON object found in response.")
         return {
             "suggestions": [],
             "summary": "Unable to generate summary."
         }
+    return _answer(parser.suggestions + rest, response_json, parser.repaired)
+
+
+def _answer(suggestions: list[dict], response_json: dict, repaired: bool) -> dict:
+    result = {"suggestions": suggestions}
+    if "summary" in response_json:
+        result["summary"] = response_json["summary"]
+    if repaired:
+        result["repaired"] = True
+    return result
 
 
-async def get_graph_suggestions(data: list[dict]) -> dict:
-    prompt = f"""
+def profile_json(data: Dataset) -> str:
+    """Bounded-size JSON description of the dataset for the prompt"""
+    return json.dumps(profile_dataset(data), default=str)
+
+
+def build_suggestions_prompt(data: Dataset) -> str:
+    return f"""
     You are an expert business intelligence analyst specializing in data visualization and strategic insights.
     
     # DATASET
-    Analyze this dataset carefully:
+    Analyze this dataset carefully. It is given as a statistical profile (schema, dtypes,
+    cardinalities, numeric quantiles, top categories, date ranges, strongest correlations
+    and a small representative sample of rows) rather than the raw records:
     ```json
-    {data}
+    {profile_json(data)}
     ```
     
     # TASK
@@ -98,12 +117,10 @@ async def get_graph_suggestions(data: list[dict]) -> dict:
     Ensure you maximize the analytical value for business stakeholders who need to make strategic decisions based on this data 
     NOTE: do not bold anything in summary.
     """
-    
-    response = model.generate_content(prompt)
-    return extract_response_parts(response.text)
 
-async def get_graph_suggestions_(data: list[dict], notes: str) -> dict:
-    prompt = f"""
+
+def build_focused_prompt(data: Dataset, notes: str) -> str:
+    return f"""
     You are an expert business intelligence analyst.
 
     # PRIMARY USER FOCUS
@@ -112,9 +129,11 @@ async def get_graph_suggestions_(data: list[dict], notes: str) -> dict:
     \"\"\"{notes}\"\"\"
 
     # DATASET
-    Analyze this dataset with specific attention to elements related to the user focus above:
+    Analyze this dataset with specific attention to elements related to the user focus above.
+    It is given as a statistical profile (schema, dtypes, cardinalities, numeric quantiles,
+    top categories, date ranges, strongest correlations and a small representative sample of rows):
     ```json
-    {data[:5]}  # Showing first 5 records for brevity, but full dataset will be analyzed
+    {profile_json(data)}
     ```
     
     There are {len(data)} records in the full dataset.
@@ -164,6 +183,276 @@ async def get_graph_suggestions_(data: list[dict], notes: str) -> dict:
     REMEMBER: Focus primarily on addressing \"\"\"{notes}\"\"\" in all your analysis and recommendations.
     NOTE: Be precise in your field selections - use exact field names from the dataset avoid bolding and using points.
     """
-    
-    response = model.generate_content(prompt)
-    return extract_response_parts(response.text)
+
+
+async def _complete(method: str, prompt: str, subject) -> tuple[str, LLMProvider]:
+    """
+    Ask the provider, bounded by LLM_TIMEOUT_SECONDS; on a timeout or an error
+    ask the fallback provider instead
+
+    Returns:
+        (response text, provider that answered)
+    """
+    active = provider
+    try:
+        async with llm_slot():
+            with timed("llm"):
+                text = await asyncio.wait_for(getattr(active, method)(prompt, subject), LLM_TIMEOUT_SECONDS or None)
+        return text, active
+    except Exception as e:
+        if fallback_provider is None or fallback_provider is active:
+            raise
+        reason = f"no answer within {LLM_TIMEOUT_SECONDS}s" if isinstance(e, asyncio.TimeoutError) else repr(e)
+        print(f"LLM provider {active.name} failed ({reason}), answering with {fallback_provider.name}")
+    with timed("llm_fallback"):
+        return await getattr(fallback_provider, method)(prompt, subject), fallback_provider
+
+
+async def _generate(build_prompt, dataset: Dataset, *args) -> dict:
+    with timed("prompt"):
+        prompt = await run_in_render_executor(build_prompt, dataset, *args)
+    text, answered_by = await _complete("generate", prompt, dataset)
+    result = extract_response_parts(text)
+    if answered_by is not provider:
+        result["fallback"] = answered_by.name
+    return result
+
+
+async def get_graph_suggestions(data: Dataset | pd.DataFrame | list[dict]) -> dict:
+    dataset = as_dataset(data)
+    key = await run_in_render_executor(request_key, "suggestions", provider.name, dataset)
+    return await llm_cache.get_or_compute(key, lambda: _generate(build_suggestions_prompt, dataset))
+
+
+async def get_graph_suggestions_(data: Dataset | pd.DataFrame | list[dict], notes: str) -> dict:
+    dataset = as_dataset(data)
+    key = await run_in_render_executor(request_key, "focused", provider.name, dataset, notes)
+    return await llm_cache.get_or_compute(key, lambda: _generate(build_focused_prompt, dataset, notes))
+
+
+async def _first_chunk_within(chunks, timeout: float):
+    """Pass the chunks through; the first must arrive within timeout seconds (0: no limit)"""
+    chunks = chunks.__aiter__()
+    try:
+        first = await asyncio.wait_for(chunks.__anext__(), timeout or None)
+    except StopAsyncIteration:
+        return
+    yield first
+    async for chunk in chunks:
+        yield chunk
+
+
+async def stream_graph_suggestions(data: Dataset | pd.DataFrame | list[dict], notes: str | None = None):
+    """
+    Suggestions as the LLM writes them
+
+    Yields ("suggestion", dict) as soon as each suggestion is complete in the
+    streamed answer, then ("summary", str). Cached answers are replayed; a
+    complete streamed answer is cached under the same key as
+    get_graph_suggestions / get_graph_suggestions_. When the provider fails,
+    or sends nothing within LLM_TIMEOUT_SECONDS, before its first suggestion,
+    the fallback provider answers in one piece.
+
+    Args:
+        data: Uploaded data
+        notes: User focus notes (None: general suggestions)
+    """
+    dataset = as_dataset(data)
+    if notes is None:
+        key = await run_in_render_executor(request_key, "suggestions", provider.name, dataset)
+        build_prompt, args = build_suggestions_prompt, ()
+    else:
+        key = await run_in_render_executor(request_key, "focused", provider.name, dataset, notes)
+        build_prompt, args = build_focused_prompt, (notes,)
+
+    cached = llm_cache.get(key)
+    if cached is not None:
+        for suggestion in cached["suggestions"]:
+            yield "suggestion", suggestion
+        yield "summary", cached.get("summary", "No summary provided.")
+        return
+
+    with timed("prompt"):
+        prompt = await run_in_render_executor(build_prompt, dataset, *args)
+    active = provider
+    parser = SuggestionStream()
+    try:
+        async with llm_slot():
+            with timed("llm"):
+                async for chunk in _first_chunk_within(active.stream(prompt, dataset), LLM_TIMEOUT_SECONDS):
+                    for suggestion in parser.feed(chunk):
+                        yield "suggestion", suggestion
+    except Exception as e:
+        if fallback_provider is None or fallback_provider is active or parser.suggestions:
+            raise
+        reason = f"no answer within {LLM_TIMEOUT_SECONDS}s" if isinstance(e, asyncio.TimeoutError) else repr(e)
+        print(f"LLM provider {active.name} failed ({reason}), answering with {fallback_provider.name}")
+        with timed("llm_fallback"):
+            result = extract_response_parts(await fallback_provider.generate(prompt, dataset))
+        for suggestion in result["suggestions"]:
+            yield "suggestion", suggestion
+        yield "summary", result.get("summary", "No summary provided.")
+        return
+
+    rest, parsed = parser.finish()
+    for suggestion in rest:
+        yield "suggestion", suggestion
+    if parsed is None:
+        print("Failed to extract structured response: no valid JSON object found in response.")
+        yield "summary", "Unable to generate summary."
+        return
+    result = _answer(parser.suggestions + rest, parsed, parser.repaired)
+    llm_cache.put(key, result)  # skipped for repaired answers and answers without a summary
+    yield "summary", result.get("summary", "No summary provided.")
+
+
+def build_batch_prompt(partition_column: str, items: list[tuple[str, Dataset]], notes: str) -> str:
+    """One prompt covering several partitions of the same dataset (all with the same schema)"""
+    profiles = {label: profile_dataset(dataset) for label, dataset in items}
+    return f"""
+    You are an expert business intelligence analyst.
+
+    # PRIMARY USER FOCUS
+    The following user notes represent the most important areas to focus on in your analysis.
+    ALL visualizations and insights MUST directly address these priorities:
+    \"\"\"{notes}\"\"\"
+
+    # DATASETS
+    The data has been split by the column "{partition_column}". Each key below is one value of
+    "{partition_column}" and maps to a statistical profile of that partition (schema, dtypes,
+    cardinalities, numeric quantiles, top categories, date ranges, strongest correlations and a
+    small representative sample of rows). All partitions share the same columns:
+    ```json
+    {json.dumps(profiles, default=str)}
+    ```
+
+    # TASK
+    Write one separate focused business analysis for EACH partition, prioritizing the user notes.
+
+    For each partition provide:
+    1. **Visualization Recommendations**: 4-6 visualizations that address the user's focus areas, each with
+       the most appropriate chart type (bar, line, scatter, pie, hist, area, box, heatmap, bubble), exact
+       field names from the dataset, a business-focused title and a 2-3 sentence insight.
+    2. **Business Summary**: key findings and actionable recommendations for that partition (200-400 words),
+       in a professional, executive-friendly style.
+
+    # EXPECTED RESPONSE FORMAT (STRICT JSON)
+    Return your answer in this exact JSON format with no additional text, with one entry per partition key:
+    ```json
+    {{
+      "reports": {{
+        "partition_key": {{
+          "suggestions": [
+            {{
+              "type": "chart_type",
+              "x": "x_field",
+              "y": "y_field",
+              "title": "Business-Focused Title",
+              "insight": "Brief explanation of what this visualization reveals and its business implications"
+            }}
+          ],
+          "summary": "Business analysis for this partition."
+        }}
+      }}
+    }}
+    ```
+
+    NOTE: Be precise in your field selections - use exact field names from the dataset avoid bolding and using points.
+    """
+
+
+def extract_batch_parts(response_text: str, labels: list[str]) -> dict:
+    """Per-partition {"suggestions", "summary"} from a batched response; missing partitions are left out"""
+    response_json = parse_response(response_text, repair=False)
+    truncated = response_json is None
+    if truncated:
+        response_json = parse_response(response_text)
+    if response_json is None:
+        print("Failed to extract structured batch response: no valid JSON object found in response.")
+        return {}
+    reports = response_json.get("reports", {})
+    if not isinstance(reports, dict):
+        return {}
+    if truncated:
+        # The summary is written last: reports without one were cut off and are asked again
+        reports = {label: report for label, report in reports.items() if isinstance(report, dict) and "summary" in report}
+    parts = {}
+    for label in labels:
+        report = reports.get(label)
+        if isinstance(report, dict):
+            # Reports kept from a cut-off answer have their summary, so they are complete
+            parts[label] = _answer(report.get("suggestions", []), report, repaired=False)
+    return parts
+
+
+async def _generate_batch(partition_column: str, items: list[tuple[str, Dataset]], notes: str) -> dict:
+    with timed("prompt"):
+        prompt = await run_in_render_executor(build_batch_prompt, partition_column, items, notes)
+    text, answered_by = await _complete("generate_batch", prompt, items)
+    parts = extract_batch_parts(text, [label for label, _ in items])
+    if answered_by is not provider:
+        for answer in parts.values():
+            answer["fallback"] = answered_by.name
+    return parts
+
+
+def _partition_keys(provider_name: str, items: list[tuple[str, Dataset]], notes: str) -> list[tuple[str, tuple]]:
+    """(focused cache key, schema) of each partition"""
+    return [(request_key("focused", provider_name, dataset, notes), dataset.schema()) for _, dataset in items]
+
+
+async def get_batch_suggestions(partition_column: str, items: list[tuple[str, Dataset]], notes: str) -> dict:
+    """
+    Focused suggestions for many partitions with as few LLM calls as possible
+
+    Partitions are grouped by schema and up to BATCH_PROMPT_PARTITIONS of them
+    share one prompt. Each partition's answer is cached under the same key as
+    a single focused request for it, so cached partitions are not sent again
+    and later single reports reuse the batched answers. Partitions missing
+    from a batched answer fall back to their own focused call.
+
+    Args:
+        partition_column: Column the data was split by
+        items: (label, Dataset) per partition
+        notes: User focus notes
+
+    Returns:
+        dict: label -> {"suggestions", "summary"}
+    """
+    results = {}
+    pending = {}  # schema -> [(label, dataset, key)]
+    # Hashing and schemas read every partition's rows: off the event loop
+    keys = await run_in_render_executor(_partition_keys, provider.name, items, notes)
+    for (label, dataset), (key, schema) in zip(items, keys):
+        cached = llm_cache.get(key)
+        if cached is not None:
+            results[label] = cached
+        else:
+            pending.setdefault(schema, []).append((label, dataset, key))
+
+    chunks = [
+        group[i:i + BATCH_PROMPT_PARTITIONS]
+        for group in pending.values()
+        for i in range(0, len(group), BATCH_PROMPT_PARTITIONS)
+    ]
+    answers = await asyncio.gather(*[
+        _generate_batch(partition_column, [(label, dataset) for label, dataset, _ in chunk], notes)
+        for chunk in chunks
+    ], return_exceptions=True)
+
+    missing = []
+    for chunk, parts in zip(chunks, answers):
+        if isinstance(parts, BaseException):
+            print(f"Batched LLM call failed: {parts}")
+            parts = {}
+        for label, dataset, key in chunk:
+            if parts.get(label, {}).get("suggestions"):
+                llm_cache.put(key, parts[label])  # fallback answers are used but not cached
+                results[label] = parts[label]
+            else:
+                missing.append((label, dataset))
+    if missing:
+        print(f"Batched answer missed {len(missing)} partition(s), asking for them one by one")
+        fallbacks = await asyncio.gather(*[get_graph_suggestions_(dataset, notes) for _, dataset in missing])
+        results.update({label: parts for (label, _), parts in zip(missing, fallbacks)})
+    return results
@@ -1,16 +1,20 @@
-from fastapi.responses import FileResponse
-import zipfile
-import tempfile
-import os
 # At the top of your graph_gen.py file
 import matplotlib
-matplotlib.use('Agg')  # Set the backend before importing pyplot
-import matplotlib.pyplot as plt
+matplotlib.use('Agg')  # Set the backend before pandas/seaborn pull in pyplot
+import numpy as np
 import pandas as pd
 import io
+import json
 import seaborn as sns
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import LogNorm
 from matplotlib.figure import Figure
 
+from config import PNG_PALETTE_COLORS
+from dataset import as_dataset
+from metrics import timed
+from zip_stream import stream_zip
+
 # Color constants
 DARK_BG = '#09090B'
 LIGHT_TEXT = '#FFFFFF'
@@ -53,118 +57,252 @@ def apply_light_theme_for_pdf(ax):
     return ax
 
 
-def generate_graphs_zip(data: list[dict], suggestions: list[dict], summary: str):
-    df = pd.DataFrame(data)
-    zip_buffer = io.BytesIO()
-
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for i, s in enumerate(suggestions):
-            if not isinstance(s, dict):
-                continue
-
-            gtype = s.get("type", "line")
-            title = s.get("title", f"graph_{i}")
-            x = s.get("x")
-            y = s.get("y")
-            labels = s.get("labels")
-            values = s.get("values")
-            size = s.get("size")
-
-            try:
-                fig, ax = plt.subplots(figsize=(12, 6), facecolor=DARK_BG)
-
-                if gtype == "scatter" and x and y:
-                    ax.scatter(df[x], df[y], color=BAR)
-
-                elif gtype == "bar" and x and y:
-                    ax.bar(df[x], df[y], color=BAR)
-
-                elif gtype == "line" and x and y:
-                    ax.plot(df[x], df[y], color=BAR, marker='o')
-
-                elif gtype == "hist" and x:
-                    ax.hist(df[x], color=VIBRANT_INDIGO_SHADES[9])
-
-                elif gtype == "box" and x and y:
-                    df.boxplot(column=[y], by=x, ax=ax,
-                               boxprops=dict(color=LIGHT_TEXT),
-                               whiskerprops=dict(color=LIGHT_TEXT),
-                               capprops=dict(color=LIGHT_TEXT),
-                               medianprops=dict(color=BAR))
-                    ax.set_title(title, color=LIGHT_TEXT)
-                    ax.set_xlabel(x, color=LIGHT_TEXT)
-                    ax.set_ylabel(y, color=LIGHT_TEXT)
-                    ax.figure.suptitle("")
-                    apply_dark_theme(ax)
-                    plt.xticks(rotation=90)
-
-                elif gtype == "pie" and labels and values:
-                    fig, ax = plt.subplots(figsize=(12, 6), facecolor=DARK_BG)
-                    wedges, texts, autotexts = ax.pie(
-                        df[values], 
-                        labels=df[labels],
-                        colors=VIBRANT_INDIGO_SHADES[:len(df)],
-                        autopct='%1.1f%%', 
-                        textprops=dict(color=DARK_TEXT, fontweight='bold')  # Dark text for better visibility
-                    )
-                    # Make sure percentage text is also dark
-                    for autotext in autotexts:
-                        autotext.set_color(DARK_TEXT)
-                        autotext.set_fontweight('bold')
-                    
-                    ax.set_title(title, color=LIGHT_TEXT)
-
-                elif gtype == "area" and x and y:
-                    ax.fill_between(df[x], df[y], color=BAR, alpha=0.6)
-
-                elif gtype == "bubble" and x and y and size:
-                    ax.scatter(df[x], df[y], s=df[size]*20, alpha=0.6, color=BAR)
-
-                elif gtype == "heatmap":
-                    numeric_df = df.select_dtypes(include='number')
-                    if numeric_df.shape[1] > 1:
-                        fig, ax = plt.subplots(figsize=(12, 8), facecolor=DARK_BG)
-                        cmap = sns.light_palette(VIBRANT_INDIGO_SHADES[-1], as_cmap=True)
-                        sns.heatmap(numeric_df.corr(), ax=ax, cmap=cmap, annot=True, fmt=".2f", cbar=False)
-                        ax.set_title(title, color=LIGHT_TEXT)
-                        for label in ax.get_xticklabels() + ax.get_yticklabels():
-                            label.set_color(LIGHT_TEXT)
-                        plt.xticks(rotation=90)
-                        plt.yticks(rotation=0)
-
-                else:
-                    plt.close(fig)
-                    continue
-
-                if gtype not in ["pie", "box", "heatmap"]:
-                    ax.set_title(title)
-                    if x: ax.set_xlabel(x)
-                    if y: ax.set_ylabel(y)
-                    apply_dark_theme(ax)
-                    if x and len(df[x]) > 5:
-                        plt.xticks(rotation=90)
+def new_figure(figsize, facecolor=None):
+    """
+    Create a standalone figure with its own Agg canvas
 
+    Figures are never registered with pyplot's figure manager, so they need no
+    plt.close() and can be rendered from several threads at once.
+    """
+    fig = Figure(figsize=figsize, facecolor=facecolor)
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    return fig, ax
+
+
+def draw_density(fig, ax, chart_config: dict, cmap, text_color=None):
+    """
+    Draw the binned 2D density grid that replaces the markers of a large
+    scatter/bubble chart (see reduction.density_grid)
+    """
+    grid = chart_config["density"]
+    counts = np.ma.masked_less_equal(grid["counts"].T, 0)
+    norm = LogNorm() if counts.count() else None
+    mesh = ax.pcolormesh(grid["xedges"], grid["yedges"], counts, cmap=cmap, norm=norm)
+    label = f"total {chart_config.get('size')}" if grid.get("weighted") else "points"
+    cbar = fig.colorbar(mesh, ax=ax, label=label)
+    if text_color:
+        cbar.ax.tick_params(colors=text_color, which="both")
+        cbar.ax.yaxis.label.set_color(text_color)
+    return mesh
+
+
+def create_zip_chart(df: pd.DataFrame, s: dict, i: int = 0):
+    """
+    Draw one chart in the dark zip style
+
+    Returns:
+        Figure, or None when the suggestion does not describe a drawable chart
+    """
+    gtype = s.get("type", "line")
+    title = s.get("title", f"graph_{i}")
+    x = s.get("x")
+    y = s.get("y")
+    labels = s.get("labels")
+    values = s.get("values")
+    size = s.get("size")
+
+    fig, ax = new_figure((12, 6), facecolor=DARK_BG)
+
+    if gtype in ("scatter", "bubble") and x and y and s.get("density") is not None:
+        draw_density(fig, ax, s, sns.light_palette(BAR, as_cmap=True), text_color=LIGHT_TEXT)
+
+    elif gtype == "scatter" and x and y:
+        ax.scatter(df[x], df[y], color=BAR)
+
+    elif gtype == "bar" and x and y:
+        ax.bar(df[x], df[y], color=BAR)
+
+    elif gtype == "line" and x and y:
+        ax.plot(df[x], df[y], color=BAR, marker='o')
+
+    elif gtype == "hist" and x:
+        ax.hist(df[x], color=VIBRANT_INDIGO_SHADES[9])
+
+    elif gtype == "box" and x and y:
+        df.boxplot(column=[y], by=x, ax=ax,
+                   boxprops=dict(color=LIGHT_TEXT),
+                   whiskerprops=dict(color=LIGHT_TEXT),
+                   capprops=dict(color=LIGHT_TEXT),
+                   medianprops=dict(color=BAR))
+        ax.set_title(title, color=LIGHT_TEXT)
+        ax.set_xlabel(x, color=LIGHT_TEXT)
+        ax.set_ylabel(y, color=LIGHT_TEXT)
+        ax.figure.suptitle("")
+        apply_dark_theme(ax)
+        ax.tick_params(axis='x', labelrotation=90)
+
+    elif gtype == "pie" and labels and values:
+        wedges, texts, autotexts = ax.pie(
+            df[values], 
+            labels=df[labels],
+            colors=VIBRANT_INDIGO_SHADES[:len(df)],
+            autopct='%1.1f%%', 
+            textprops=dict(color=DARK_TEXT, fontweight='bold')  # Dark text for better visibility
+        )
+        # Make sure percentage text is also dark
+        for autotext in autotexts:
+            autotext.set_color(DARK_TEXT)
+            autotext.set_fontweight('bold')
+        
+        ax.set_title(title, color=LIGHT_TEXT)
+
+    elif gtype == "area" and x and y:
+        ax.fill_between(df[x], df[y], color=BAR, alpha=0.6)
+
+    elif gtype == "bubble" and x and y and size:
+        ax.scatter(df[x], df[y], s=df[size]*20, alpha=0.6, color=BAR)
+
+    elif gtype == "heatmap":
+        numeric_df = df.select_dtypes(include='number')
+        if numeric_df.shape[1] > 1:
+            fig, ax = new_figure((12, 8), facecolor=DARK_BG)
+            cmap = sns.light_palette(VIBRANT_INDIGO_SHADES[-1], as_cmap=True)
+            sns.heatmap(numeric_df.corr(), ax=ax, cmap=cmap, annot=True, fmt=".2f", cbar=False)
+            ax.set_title(title, color=LIGHT_TEXT)
+            for label in ax.get_xticklabels() + ax.get_yticklabels():
+                label.set_color(LIGHT_TEXT)
+            ax.tick_params(axis='x', labelrotation=90)
+            ax.tick_params(axis='y', labelrotation=0)
+
+    else:
+        return None
+
+    if gtype not in ["pie", "box", "heatmap"]:
+        ax.set_title(title)
+        if x: ax.set_xlabel(x)
+        if y: ax.set_ylabel(y)
+        apply_dark_theme(ax)
+        if x and len(df[x]) > 5:
+            ax.tick_params(axis='x', labelrotation=90)
+
+    fig.tight_layout(pad=3.0)
+    return fig
+
+
+# Rendering themes understood by render_png
+THEME_ZIP = "zip"    # dark 12x6 style of generate_graphs_zip
+THEME_DARK = "dark"  # generate_chart with the dark theme
+THEME_PDF = "pdf"    # generate_chart with the light PDF theme
+
+# Figure width in inches per theme, used to size the pre-plot reduction
+FIGURE_WIDTH = {THEME_ZIP: 12, THEME_DARK: 10, THEME_PDF: 10}
+
+
+def pixel_width(theme: str, dpi: int) -> int:
+    return int(FIGURE_WIDTH.get(theme, 10) * dpi)
+
+
+def _theme_figure(df: pd.DataFrame, chart_config: dict, theme: str, index: int):
+    if theme == THEME_ZIP:
+        return create_zip_chart(df, chart_config, index)
+    # Errors reach the render engine as failures, so an error figure is never cached as the chart
+    return generate_chart(df, chart_config, for_pdf=(theme == THEME_PDF), raise_errors=True)
 
-                
-                plt.tight_layout(pad=3.0)
 
-                img_buf = io.BytesIO()
-                fig.savefig(img_buf, format="png", bbox_inches="tight", transparent=True, dpi=100)
-                plt.close(fig)
-                img_buf.seek(0)
-                zipf.writestr(f"{title.replace(' ', '_')}.png", img_buf.read())
+def render_png(df: pd.DataFrame, chart_config: dict, theme: str = THEME_PDF, dpi: int = 200, index: int = 0):
+    """
+    Render a single chart straight to PNG bytes
+
+    This is the unit of work executed by the render engine, in-process or in a
+    worker process.
+
+    Returns:
+        bytes: PNG image, or None if the zip theme has nothing to draw
+    """
+    fig = _theme_figure(df, chart_config, theme, index)
+    if fig is None:
+        return None
+
+    img_buf = io.BytesIO()
+    if theme == THEME_PDF:
+        fig.savefig(img_buf, format="png", bbox_inches="tight", dpi=dpi)
+        return img_buf.getvalue()
+
+    fig.savefig(img_buf, format="png", bbox_inches="tight", transparent=True, dpi=dpi)
+    if PNG_PALETTE_COLORS:
+        return optimize_png(img_buf.getvalue(), PNG_PALETTE_COLORS)
+    return img_buf.getvalue()
+
+
+def render_svg(df: pd.DataFrame, chart_config: dict, theme: str = THEME_PDF, dpi: int = 200, index: int = 0):
+    """
+    Render a single chart to SVG bytes for vector embedding in the PDF
+    report. `dpi` only affects rasterized artists.
+
+    Returns:
+        bytes: SVG document, or None if the zip theme has nothing to draw
+    """
+    fig = _theme_figure(df, chart_config, theme, index)
+    if fig is None:
+        return None
+    img_buf = io.BytesIO()
+    # Keep text as <text> elements: ReportLab sets them in its own fonts, far
+    # cheaper than converting every glyph outline into a path
+    with matplotlib.rc_context({"svg.fonttype": "none"}):
+        fig.savefig(img_buf, format="svg", bbox_inches="tight", dpi=dpi)
+    return img_buf.getvalue()
+
+
+def optimize_png(png: bytes, colors: int) -> bytes:
+    """Palette-quantize a PNG (alpha included) and re-encode it with maximum compression"""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(png)) as img:
+        quantized = img.convert("RGBA").quantize(colors=colors, method=Image.Quantize.FASTOCTREE)
+    out = io.BytesIO()
+    quantized.save(out, format="PNG", optimize=True)
+    # Keep the original when quantization does not pay off
+    return out.getvalue() if out.tell() < len(png) else png
+
+
+def _zip_entries(dataset, charts: list[dict], summary: str, theme: str):
+    """
+    Yield (filename, content) for each chart as soon as it is rendered, then
+    the chart metadata (charts.json) and the summary
+    """
+    from render_engine import iter_render_charts
+
+    manifest = []
+    for i, (s, result) in enumerate(iter_render_charts(dataset, charts, theme=theme, dpi=100)):
+        title = s.get("title", f"graph_{i}")
+        if result.error is not None:
+            print(f"Error generating {title}: {result.error}")
+            continue
+        if result.image is None:
+            continue
+        filename = f"{title.replace(' ', '_')}.png"
+        manifest.append({"file": filename, "title": title, "type": s.get("type"), **(result.meta or {})})
+        yield filename, result.image
+
+    yield "charts.json", json.dumps(manifest, indent=2, default=str)
+    # Add summary as a text file
+    yield "summary.txt", summary
+
+
+def iter_graphs_zip(data, suggestions: list[dict], summary: str):
+    """
+    Stream the charts zip: each chart is compressed and emitted as soon as it
+    is rendered, and summary.txt comes last. The "zip" stage covers the whole
+    stream, chart rendering included.
 
-            except Exception as e:
-                print(f"Error generating {title}: {e}")
-                continue
+    Args:
+        data: Dataset (or DataFrame / list of row dicts)
+
+    Yields:
+        bytes: zip archive chunks
+    """
+    dataset = as_dataset(data)
+    charts = [s for s in suggestions if isinstance(s, dict)]
+    with timed("zip"):
+        yield from stream_zip(_zip_entries(dataset, charts, summary, THEME_ZIP))
 
-        # Add summary as a text file
-        zipf.writestr("summary.txt", summary)
 
-    zip_buffer.seek(0)
-    return zip_buffer
+def generate_graphs_zip(data, suggestions: list[dict], summary: str):
+    """Build the charts zip in memory (see iter_graphs_zip for the streaming form)"""
+    return io.BytesIO(b"".join(iter_graphs_zip(data, suggestions, summary)))
 
-def generate_chart(df: pd.DataFrame, chart_config: dict, for_pdf: bool = True):
+def generate_chart(df: pd.DataFrame, chart_config: dict, for_pdf: bool = True, raise_errors: bool = False):
     """
     Create a single chart based on configuration
     
@@ -172,6 +310,7 @@ def generate_chart(df: pd.DataFrame, chart_config: dict, for_pdf: bool = True):
         df: DataFrame with the data
         chart_config: Configuration for the chart
         for_pdf: Whether to use light theme (for PDF) or dark theme
+        raise_errors: Raise drawing errors instead of returning an error figure
         
     Returns:
         Figure: Matplotlib figure object
@@ -184,10 +323,14 @@ def generate_chart(df: pd.DataFrame, chart_config: dict, for_pdf: bool = True):
     values = chart_config.get("values")
     size = chart_config.get("size")
     
-    fig, ax = plt.subplots(figsize=(10, 6))
+    fig, ax = new_figure((10, 6))
     
     try:
-        if gtype == "scatter" and x and y:
+        if gtype in ("scatter", "bubble") and x and y and chart_config.get("density") is not None:
+            draw_density(fig, ax, chart_config, sns.light_palette('#7C3AED', as_cmap=True),
+                         text_color=None if for_pdf else LIGHT_TEXT)
+
+        elif gtype == "scatter" and x and y:
             ax.scatter(df[x], df[y], color=BAR if not for_pdf else '#7C3AED')
 
         elif gtype == "bar" and x and y:
@@ -195,7 +338,7 @@ def generate_chart(df: pd.DataFrame, chart_config: dict, for_pdf: bool = True):
             if len(df[x].unique()) > 10:
                 # Horizontal bar chart for many categories
                 ax.barh(df[x], df[y], color=BAR if not for_pdf else '#7C3AED')
-                plt.tight_layout(pad=3.0)
+                fig.tight_layout(pad=3.0)
             else:
                 ax.bar(df[x], df[y], color=BAR if not for_pdf else '#7C3AED')
 
@@ -222,7 +365,7 @@ def generate_chart(df: pd.DataFrame, chart_config: dict, for_pdf: bool = True):
                 apply_dark_theme(ax)
             else:
                 apply_light_theme_for_pdf(ax)
-            plt.xticks(rotation=90)
+            ax.tick_params(axis='x', labelrotation=90)
 
         elif gtype == "pie" and labels and values:
             # Handle pie charts - limit to top categories if there are too many
@@ -275,8 +418,8 @@ def generate_chart(df: pd.DataFrame, chart_config: dict, for_pdf: bool = True):
                 cmap = sns.light_palette('#7C3AED', as_cmap=True)
                 sns.heatmap(numeric_df.corr(), ax=ax, cmap=cmap, annot=True, fmt=".2f", cbar=True)
                 ax.set_title(title)
-                plt.xticks(rotation=90)
-                plt.yticks(rotation=0)
+                ax.tick_params(axis='x', labelrotation=90)
+                ax.tick_params(axis='y', labelrotation=0)
         
         # Set labels and styling
         if gtype not in ["pie", "box", "heatmap"]:
@@ -290,52 +433,28 @@ def generate_chart(df: pd.DataFrame, chart_config: dict, for_pdf: bool = True):
                 apply_light_theme_for_pdf(ax)
                 
             if x and len(df[x].unique()) > 5:
-                plt.xticks(rotation=90)
+                ax.tick_params(axis='x', labelrotation=90)
         
-        plt.tight_layout(pad=3.0)
+        fig.tight_layout(pad=3.0)
         return fig
         
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"Error generating chart '{title}': {e}")
-        plt.close(fig)
         # Return a simple error figure
-        error_fig, error_ax = plt.subplots(figsize=(10, 6))
+        error_fig, error_ax = new_figure((10, 6))
         error_ax.text(0.5, 0.5, f"Error creating chart: {str(e)}", 
                  horizontalalignment='center', verticalalignment='center')
         error_ax.axis('off')
         return error_fig
 
-def generate_graphs_zip_(data: list[dict], suggestions: dict):
+def generate_graphs_zip_(data, suggestions: dict):
     """Generate graphs and return as zip file"""
-    df = pd.DataFrame(data)
-    zip_buffer = io.BytesIO()
+    dataset = as_dataset(data)
     
     # Extract suggestions and summary
-    graph_suggestions = suggestions.get("suggestions", [])
+    graph_suggestions = [s for s in suggestions.get("suggestions", []) if isinstance(s, dict)]
     summary = suggestions.get("summary", "No summary provided.")
 
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for i, s in enumerate(graph_suggestions):
-            if not isinstance(s, dict):
-                continue
-
-            title = s.get("title", f"graph_{i}")
-            
-            try:
-                fig = generate_chart(df, s, for_pdf=False)
-                
-                img_buf = io.BytesIO()
-                fig.savefig(img_buf, format="png", bbox_inches="tight", transparent=True, dpi=100)
-                plt.close(fig)
-                img_buf.seek(0)
-                zipf.writestr(f"{title.replace(' ', '_')}.png", img_buf.read())
-
-            except Exception as e:
-                print(f"Error generating {title}: {e}")
-                continue
-
-        # Add summary as a text file
-        zipf.writestr("summary.txt", summary)
-
-    zip_buffer.seek(0)
-    return zip_buffer
\ No newline at end of file
+    return io.BytesIO(b"".join(stream_zip(_zip_entries(dataset, graph_suggestions, summary, THEME_DARK))))
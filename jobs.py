@@ -0,0 +1,281 @@
+"""
+Background jobs for long-running requests.
+
+Creating a job returns its id at once. A fixed number of in-process workers
+take jobs from an asyncio queue, run them and record status, stage progress
+and the result in a JobStore, which the status and result endpoints read.
+MemoryJobStore keeps everything in this process; another backend (e.g.
+Redis) only has to implement the JobStore methods.
+
+Results stay in the (spooled) temporary file the pipeline wrote them to and
+are streamed from there; the store keeps at most JOB_MAX_RESULTS of them and
+closes a result's file when it expires or is evicted.
+"""
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from config import JOB_MAX_QUEUED, JOB_MAX_RESULTS, JOB_TTL_SECONDS, JOB_WORKERS
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobResult:
+    """
+    Output of a finished job, in a file the result owns (e.g. a spooled temp file)
+
+    Several downloads can read it at once; discard() closes the file as soon
+    as no download is reading it any more.
+    """
+
+    def __init__(self, file, media_type: str, filename: str):
+        self.file = file
+        self.media_type = media_type
+        self.filename = filename
+        self.size = file.seek(0, 2)
+        self._lock = threading.Lock()
+        self._readers = 0
+        self._discarded = False
+
+    def reader(self, chunk_size: int = 64 * 1024) -> "ResultReader":
+        """Iterator over the content in chunks; close it when done"""
+        with self._lock:
+            self._readers += 1
+        return ResultReader(self, chunk_size)
+
+    def _read(self, offset: int, size: int) -> bytes:
+        with self._lock:
+            self.file.seek(offset)
+            return self.file.read(size)
+
+    def _release(self):
+        with self._lock:
+            self._readers -= 1
+            close = self._discarded and not self._readers
+        if close:
+            self.file.close()
+
+    def discard(self):
+        with self._lock:
+            self._discarded = True
+            close = not self._readers
+        if close:
+            self.file.close()
+
+
+class ResultReader:
+    """One download of a JobResult, with its own read position"""
+
+    def __init__(self, result: JobResult, chunk_size: int):
+        self.result = result
+        self.chunk_size = chunk_size
+        self.offset = 0
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        if self.closed:
+            raise StopIteration
+        chunk = self.result._read(self.offset, self.chunk_size)
+        if not chunk:
+            self.close()
+            raise StopIteration
+        self.offset += len(chunk)
+        return chunk
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.result._release()
+
+
+class JobStore(ABC):
+    """Storage interface for job records and results; implementations must be thread-safe"""
+
+    @abstractmethod
+    def create(self, kind: str) -> dict:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def update(self, job_id: str, **fields):
+        ...
+
+    @abstractmethod
+    def set_result(self, job_id: str, result: JobResult):
+        ...
+
+    @abstractmethod
+    def get_result(self, job_id: str) -> Optional[JobResult]:
+        ...
+
+
+class MemoryJobStore(JobStore):
+    """
+    Job records and results in a dict; finished jobs expire after ttl_seconds,
+    and beyond max_results stored results the oldest job is dropped
+    """
+
+    def __init__(self, ttl_seconds: int = JOB_TTL_SECONDS, max_results: int = JOB_MAX_RESULTS):
+        self.ttl_seconds = ttl_seconds
+        self.max_results = max_results
+        self._jobs = {}
+        self._results = OrderedDict()  # job id -> JobResult, oldest first
+        self._lock = threading.Lock()
+
+    def create(self, kind: str) -> dict:
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "status": QUEUED,
+            "stage": QUEUED,
+            "progress": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "finished_at": None,
+        }
+        with self._lock:
+            self._purge(now)
+            self._jobs[job["id"]] = job
+            return dict(job)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            self._purge(time.time())
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(fields, updated_at=time.time())
+            if fields.get("status") in (DONE, FAILED):
+                job["finished_at"] = job["updated_at"]
+
+    def set_result(self, job_id: str, result: JobResult):
+        discarded = []
+        with self._lock:
+            if job_id not in self._jobs:
+                discarded.append(result)
+            else:
+                self._results[job_id] = result
+                while len(self._results) > self.max_results:
+                    oldest, old_result = self._results.popitem(last=False)
+                    self._jobs.pop(oldest, None)
+                    discarded.append(old_result)
+        for old_result in discarded:
+            old_result.discard()
+
+    def get_result(self, job_id: str) -> Optional[JobResult]:
+        with self._lock:
+            self._purge(time.time())
+            return self._results.get(job_id)
+
+    def _purge(self, now: float):
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] is not None and now - job["finished_at"] > self.ttl_seconds
+        ]
+        for job_id in expired:
+            self._jobs.pop(job_id, None)
+            result = self._results.pop(job_id, None)
+            if result is not None:
+                result.discard()
+
+
+# progress(stage, done=None, total=None); safe to call from worker threads
+Progress = Callable[..., None]
+
+
+class JobQueue:
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS, max_queued: int = JOB_MAX_QUEUED):
+        self.store = store
+        self.workers = workers
+        self.max_queued = max_queued
+        self._queue = None
+        self._tasks = []
+
+    def _ensure_workers(self):
+        """Start the worker tasks on the running loop (on first use, and again after stop())"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [asyncio.create_task(self._worker(), name=f"job-worker-{n}") for n in range(self.workers)]
+
+    def submit(self, kind: str, run: Callable[[Progress], Awaitable[JobResult]]) -> dict:
+        """
+        Queue a job
+
+        Args:
+            kind: Job type, e.g. "report"
+            run: Coroutine function producing the result; receives a progress callback
+
+        Returns:
+            dict: the new job record
+
+        Raises:
+            asyncio.QueueFull: when max_queued jobs are already waiting
+        """
+        self._ensure_workers()
+        if self._queue.full():
+            raise asyncio.QueueFull
+        job = self.store.create(kind)
+        self._queue.put_nowait((job["id"], run))
+        return job
+
+    def _progress(self, job_id: str) -> Progress:
+        def progress(stage: str, done: Optional[int] = None, total: Optional[int] = None):
+            counts = {"done": done, "total": total} if total is not None else None
+            self.store.update(job_id, stage=stage, progress=counts)
+        return progress
+
+    async def _worker(self):
+        while True:
+            job_id, run = await self._queue.get()
+            try:
+                self.store.update(job_id, status=RUNNING, stage="starting")
+                result = await run(self._progress(job_id))
+                self.store.set_result(job_id, result)
+                self.store.update(job_id, status=DONE, stage=DONE, progress=None)
+            except asyncio.CancelledError:
+                self.store.update(job_id, status=FAILED, error="Server shut down before the job finished")
+                raise
+            except Exception as e:
+                logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+                detail = getattr(e, "detail", None) or str(e)
+                self.store.update(job_id, status=FAILED, error=str(detail))
+            finally:
+                self._queue.task_done()
+
+    async def stop(self):
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Jobs still waiting in the queue will never run
+        while self._queue is not None and not self._queue.empty():
+            job_id, _ = self._queue.get_nowait()
+            self.store.update(job_id, status=FAILED, error="Server shut down before the job started")
+
+
+job_store = MemoryJobStore()
+job_queue = JobQueue(job_store)
@@ -0,0 +1,199 @@
+"""
+Tolerant JSON extraction from LLM output.
+
+LLM answers wrap the JSON object in prose or markdown fences, sometimes add
+text with braces after it, and are cut off when the model hits its output
+limit. parse_response finds the first complete JSON object, and repairs a
+truncated one by dropping the unfinished tail and closing what is still open.
+
+SuggestionStream parses a response while it is being streamed and hands out
+each element of the "suggestions" array as soon as its closing brace
+arrives, so charts can be rendered before the model has written the summary.
+"""
+import json
+from typing import Optional
+
+_decoder = json.JSONDecoder()
+# Start positions tried before giving up on finding a complete object
+MAX_OBJECT_STARTS = 50
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def _scan(text: str, start: int) -> tuple[Optional[int], list]:
+    """
+    Match the brackets of the object starting at `start`
+
+    Returns:
+        (index after its closing brace, or None when the text ends first;
+        (end index, open brackets) after each complete element, latest last)
+    """
+    stack = []
+    in_string = escape = False
+    cuts = []
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append(ch)
+        elif ch in "}]":
+            stack.pop()
+            if not stack:
+                return i + 1, cuts
+            cuts.append((i + 1, list(stack)))
+        elif ch == ",":
+            cuts.append((i, list(stack)))
+    return None, cuts
+
+
+def _repair_truncated(text: str, start: int, cuts: list) -> Optional[dict]:
+    """
+    Close an object that was cut off: keep everything up to the last complete
+    element and close the brackets that are still open
+    """
+    for end, open_brackets in reversed(cuts):
+        repaired = _loads(text[start:end] + "".join(_CLOSERS[b] for b in reversed(open_brackets)))
+        if repaired is not None:
+            return repaired
+    return None
+
+
+def _loads(text: str) -> Optional[dict]:
+    try:
+        value = json.loads(text)
+    except ValueError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def parse_response(text: str, repair: bool = True) -> Optional[dict]:
+    """
+    The JSON object in an LLM answer
+
+    Args:
+        text: Response text
+        repair: Whether a truncated object is repaired (False: complete objects only)
+
+    Returns:
+        dict: the first complete object, or the repaired prefix of a truncated
+        one; None when the text holds no usable object
+    """
+    start = text.find("{")
+    tries = 0
+    while start != -1 and tries < MAX_OBJECT_STARTS:
+        tries += 1
+        try:
+            return _decoder.raw_decode(text, start)[0]
+        except ValueError:
+            pass
+        end, cuts = _scan(text, start)
+        if end is not None:  # braces in prose: look after them
+            start = text.find("{", end)
+            continue
+        # Runs to the end of the text: the answer was cut off
+        if not repair:
+            return None
+        value = _repair_truncated(text, start, cuts)
+        if value is not None:
+            return value
+        start = text.find("{", start + 1)
+    return None
+
+
+class SuggestionStream:
+    """
+    Incremental parser for a streamed {"suggestions": [...], "summary": ...} answer
+
+    feed() scans only the new text and returns the suggestions completed by
+    it; finish() parses the whole answer (tolerantly) once the stream ends.
+    """
+
+    def __init__(self, key: str = "suggestions"):
+        self.key = key
+        self.suggestions = []
+        # Set by finish(): the answer was cut off and had to be repaired
+        self.repaired = False
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None
+        self._in_array = False
+        self._item_start = None
+        self._done = False
+
+    def feed(self, chunk: str) -> list[dict]:
+        """Add streamed text; returns the suggestions it completed"""
+        self._text += chunk
+        found = []
+        text = self._text
+        for i in range(self._pos, len(text)):
+            if self._done:
+                break
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = text[self._string_start + 1:i]
+                continue
+            if self._depth == 0:
+                if ch == "{":  # prose before the object is skipped
+                    self._depth = 1
+                continue
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in "{[":
+                if ch == "[" and self._depth == 1 and self._last_string == self.key:
+                    self._in_array = True
+                elif ch == "{" and self._in_array and self._depth == 2:
+                    self._item_start = i
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._in_array and self._depth == 2 and ch == "}" and self._item_start is not None:
+                    item = _loads(text[self._item_start:i + 1])
+                    if item is not None:
+                        self.suggestions.append(item)
+                        found.append(item)
+                    self._item_start = None
+                elif self._in_array and self._depth == 1:
+                    self._in_array = False
+                elif self._depth == 0:
+                    self._done = True
+        self._pos = len(text)
+        return found
+
+    def finish(self) -> tuple[list[dict], Optional[dict]]:
+        """
+        Parse the complete answer
+
+        Returns:
+            (suggestions not handed out by feed, parsed object or None).
+            When the answer was cut off (self.repaired) only suggestions whose
+            closing brace arrived count: the repaired tail may hold a
+            half-written one.
+        """
+        parsed = parse_response(self._text, repair=False)
+        if parsed is None:
+            parsed = parse_response(self._text)
+            self.repaired = parsed is not None
+        if parsed is None or self.repaired or not self._done:
+            return [], parsed
+        complete = [s for s in parsed.get(self.key) or [] if isinstance(s, dict)]
+        return complete[len(self.suggestions):], parsed
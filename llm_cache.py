@@ -0,0 +1,143 @@
+"""
+TTL + LRU cache for parsed LLM responses, with in-flight request coalescing.
+
+Concurrent requests for the same key wait on a single upstream call instead
+of each paying for their own.
+"""
+import asyncio
+import copy
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+import pandas as pd
+
+from config import LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_SECONDS
+from dataset import Dataset, frame_fingerprint
+
+
+def _canonical(part):
+    """Datasets and DataFrames are reduced to a content hash instead of being serialised"""
+    if isinstance(part, Dataset):
+        return {"frame": part.fingerprint}
+    if isinstance(part, pd.DataFrame):
+        return {"frame": frame_fingerprint(part)}
+    return part
+
+
+def request_key(kind: str, *parts) -> str:
+    """Canonical hash of a prompt kind and its inputs (data, notes, ...)"""
+    parts = [_canonical(part) for part in parts]
+    payload = json.dumps([kind, *parts], sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def is_usable_response(result: dict) -> bool:
+    """
+    Only cache complete responses: at least one suggestion and a summary,
+    from the configured provider (fallback answers are marked "fallback"),
+    and not repaired after being cut off (marked "repaired")
+    """
+    return (
+        bool(result.get("suggestions"))
+        and "summary" in result
+        and not result.get("fallback")
+        and not result.get("repaired")
+    )
+
+
+class LLMCache:
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, result)
+        self._inflight = {}  # key -> asyncio.Future
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def _put(self, key: str, result: dict):
+        if self.max_entries <= 0 or self.ttl_seconds <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str):
+        """Cached result for key, or None (a miss is not counted: callers compute it elsewhere)"""
+        result = self._get(key)
+        if result is None:
+            return None
+        self.hits += 1
+        return copy.deepcopy(result)
+
+    def put(self, key: str, result: dict):
+        """Cache a result computed outside get_or_compute (e.g. one part of a batched call)"""
+        if is_usable_response(result):
+            self._put(key, copy.deepcopy(result))
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[dict]]) -> dict:
+        """
+        Return the cached result for key, or compute it once
+
+        Callers that arrive while the same key is already being computed
+        await that call's result.
+        """
+        result = self._get(key)
+        if result is not None:
+            self.hits += 1
+            return copy.deepcopy(result)
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return copy.deepcopy(await asyncio.shield(inflight))
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            # Waiters must not inherit the owner's cancellation (e.g. a client disconnect)
+            future.set_exception(RuntimeError("Upstream LLM call was cancelled"))
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception retrieved when nobody else was waiting on it
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            if is_usable_response(result):
+                self._put(key, result)
+        finally:
+            self._inflight.pop(key, None)
+        return copy.deepcopy(result)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+        }
+
+
+llm_cache = LLMCache(max_entries=LLM_CACHE_MAX_ENTRIES, ttl_seconds=LLM_CACHE_TTL_SECONDS)
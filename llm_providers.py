@@ -0,0 +1,138 @@
+"""
+Backends that answer the chart suggestion prompts.
+
+A provider turns a prompt (plus the dataset it describes) into the raw
+response text that gemini.py parses, so every backend shares one parsing
+and caching path:
+
+- GeminiProvider: the Gemini API; the client is configured on first use,
+  not at import time
+- LocalProvider: deterministic offline backend for load tests, benchmarks,
+  CI and as a fallback when the LLM is slow. It answers with a canned
+  response, or with the charts recommender.py picks from the dataset schema,
+  after an optional simulated latency.
+
+stream() yields the response text in chunks as it is generated, so the
+parser in json_stream.py can hand out suggestions before the answer is
+complete; providers without streaming yield the whole answer at once.
+
+LLM_PROVIDER selects the backend, see config.py.
+"""
+import asyncio
+import json
+import os
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from concurrency import run_in_render_executor
+from config import LOCAL_LLM_LATENCY_MS, LOCAL_LLM_RESPONSE_FILE
+from dataset import Dataset
+from recommender import recommend
+
+GEMINI_MODEL_NAME = "gemini-1.5-flash-latest"
+# Pieces a LocalProvider answer is split into when streamed
+STREAM_CHUNKS = 16
+
+
+class LLMProvider(ABC):
+    """Interface of a suggestion backend; `name` is part of the LLM cache key"""
+
+    name = ""
+
+    @abstractmethod
+    async def generate(self, prompt: str, dataset: Dataset) -> str:
+        """Answer a suggestions / focused prompt about one dataset"""
+
+    @abstractmethod
+    async def generate_batch(self, prompt: str, items: list[tuple[str, Dataset]]) -> str:
+        """Answer a batch prompt about several (label, Dataset) partitions"""
+
+    async def stream(self, prompt: str, dataset: Dataset):
+        """Answer like generate(), as an async iterator of text chunks"""
+        yield await self.generate(prompt, dataset)
+
+
+class GeminiProvider(LLMProvider):
+    def __init__(self, model_name: str = GEMINI_MODEL_NAME):
+        self.name = model_name
+        self._model = None
+
+    @property
+    def model(self):
+        if self._model is None:
+            import google.generativeai as genai
+
+            genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+            self._model = genai.GenerativeModel(model_name=self.name)
+        return self._model
+
+    async def _complete(self, prompt: str) -> str:
+        response = await self.model.generate_content_async(prompt)
+        return response.text
+
+    async def generate(self, prompt: str, dataset: Dataset) -> str:
+        return await self._complete(prompt)
+
+    async def generate_batch(self, prompt: str, items: list[tuple[str, Dataset]]) -> str:
+        return await self._complete(prompt)
+
+    async def stream(self, prompt: str, dataset: Dataset):
+        response = await self.model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            yield chunk.text
+
+
+class LocalProvider(LLMProvider):
+    """
+    Offline backend: answers with `response` (a {"suggestions", "summary"}
+    dict) when given, otherwise with the rule-based recommender, after
+    `latency` seconds (spread over the chunks when streaming)
+    """
+
+    name = "local"
+
+    def __init__(self, latency: float = 0.0, response: Optional[dict] = None):
+        self.latency = latency
+        self.response = response
+
+    def _answer(self, dataset: Dataset) -> dict:
+        return self.response if self.response is not None else recommend(dataset)
+
+    async def generate(self, prompt: str, dataset: Dataset) -> str:
+        await asyncio.sleep(self.latency)
+        return json.dumps(await run_in_render_executor(self._answer, dataset), default=str)
+
+    async def generate_batch(self, prompt: str, items: list[tuple[str, Dataset]]) -> str:
+        await asyncio.sleep(self.latency)
+        reports = {label: await run_in_render_executor(self._answer, dataset) for label, dataset in items}
+        return json.dumps({"reports": reports}, default=str)
+
+    async def stream(self, prompt: str, dataset: Dataset):
+        text = json.dumps(await run_in_render_executor(self._answer, dataset), default=str)
+        size = max(1, -(-len(text) // STREAM_CHUNKS))
+        for start in range(0, len(text), size):
+            await asyncio.sleep(self.latency / STREAM_CHUNKS)
+            yield text[start:start + size]
+
+
+def local_provider_from_config() -> LocalProvider:
+    response = None
+    if LOCAL_LLM_RESPONSE_FILE:
+        with open(LOCAL_LLM_RESPONSE_FILE) as f:
+            response = json.load(f)
+    return LocalProvider(latency=LOCAL_LLM_LATENCY_MS / 1000, response=response)
+
+
+PROVIDERS = {"gemini": GeminiProvider, "local": local_provider_from_config}
+
+
+def make_provider(name: str) -> LLMProvider:
+    """
+    Build a provider by name
+
+    Raises:
+        ValueError: for unknown provider names
+    """
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider {name!r}; choose from {sorted(PROVIDERS)}")
+    return PROVIDERS[name]()
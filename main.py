@@ -1,18 +1,35 @@
+import asyncio
+from contextlib import asynccontextmanager
 from typing import Dict, List
-from fastapi import FastAPI, HTTPException, Response
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, PlainTextResponse
 import pandas as pd
 from pydantic import BaseModel
-from schemas import DataRequest, DataRequest1
-from gemini import get_graph_suggestions, get_graph_suggestions_
-from graph_gen import generate_graphs_zip  # <-- updated import
+from schemas import BatchReportRequest, DataRequest, DataRequest1
+from graph_gen import iter_graphs_zip
 import logging
-from report_generator import create_pdf_report
+from report_generator import iter_file_chunks
+from pipeline import (REPORT_FILENAME, batch_pipeline, batch_request, report_job, report_pipeline, report_request,
+                      request_mode, suggest)
+from jobs import DONE, FAILED, job_queue, job_store
+from dataset import Dataset
+from uploads import read_upload, upload_openapi
+from concurrency import iterate_in_render_executor, run_in_upload_executor, shutdown_executors
+from chart_cache import chart_cache
+from llm_cache import llm_cache
+from progressive import graph_events
+from metrics import ServerTimingMiddleware, render_metrics, timed
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("main")
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await job_queue.stop()
+    shutdown_executors()
+
+app = FastAPI(lifespan=lifespan)
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -28,37 +45,69 @@ app.add_middleware(
     expose_headers=["*"]  
 )
 
+# Per-stage timings of each request in a Server-Timing header, see metrics.py
+app.add_middleware(ServerTimingMiddleware)
+
 from fastapi.responses import StreamingResponse
 
-@app.post("/generate-graphs")
-async def generate_graphs_endpoint(request: DataRequest):
+@app.post("/generate-graphs", openapi_extra=upload_openapi(DataRequest))
+async def generate_graphs_endpoint(request: Request):
     try:
-        logger.info("Received request data")
-        logger.info("Calling Gemini to get graph suggestions...")
-        gemini_result = await get_graph_suggestions(request.data)
+        upload = await read_upload(request)
+        mode = request_mode(upload)
+        with timed("dataframe"):
+            dataset = await run_in_upload_executor(Dataset, upload.frame)
+        logger.info(f"Received request data ({len(dataset)} rows)")
+        logger.info("Calling Gemini to get graph suggestions..." if mode == "llm" else "Recommending charts...")
+        gemini_result = await suggest(dataset, mode=mode)
 
         suggestions = gemini_result["suggestions"]
-        summary = gemini_result["summary"]
+        summary = gemini_result.get("summary", "No summary provided.")
 
-        logger.info("Generating graphs + summary zip...")
-        zip_buffer = generate_graphs_zip(request.data, suggestions, summary)
+        logger.info("Streaming graphs + summary zip...")
+        zip_stream = iter_graphs_zip(dataset, suggestions, summary)
 
         return StreamingResponse(
-            zip_buffer,
+            iterate_in_render_executor(zip_stream),
             media_type="application/zip",
             headers={"Content-Disposition": "attachment; filename=generated_charts.zip"}
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error during /generate-graphs: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/generate-graphs/stream", openapi_extra=upload_openapi(DataRequest))
+async def generate_graphs_stream_endpoint(request: Request):
+    """
+    Charts as Server-Sent Events: charts picked from the schema are rendered
+    while the LLM call is in flight, its charts and summary follow
+    """
+    try:
+        upload = await read_upload(request)
+        mode = request_mode(upload)
+        with timed("dataframe"):
+            dataset = await run_in_upload_executor(Dataset, upload.frame)
+        logger.info(f"Received progressive request ({len(dataset)} rows)")
+        return StreamingResponse(
+            graph_events(dataset, mode),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error during /generate-graphs/stream: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 class JSONData(BaseModel):
     records: List[Dict]
 
 # @app.post("/generate-report")
 # async def generate_report(request: DataRequest):
 #     try:
-#         logger.info("Generating in-memory PDF report...")
+#         logger.info("Generating PDF report...")
 #         pdf_buffer = create_pdf_report(request.data)  # passing `data` list of dicts
 
 #         return StreamingResponse(
@@ -70,30 +119,101 @@ class JSONData(BaseModel):
 #         logger.error(f"Error generating report: {e}")
 #         raise HTTPException(status_code=500, detail=str(e))
     
-@app.post("/generate-report")
-async def generate_report_endpoint(request: DataRequest1):
+@app.post("/generate-report", openapi_extra=upload_openapi(DataRequest1))
+async def generate_report_endpoint(request: Request):
     """Generate a PDF report with data analysis and visualizations"""
     try:
-        logger.info("Received report generation request")
-        logger.info("Calling Gemini to get insights...")
-        # data = request.data
-        notes = request.notes 
-        gemini_response = await get_graph_suggestions_(request.data, notes)
-        logger.info("Generating in-memory PDF report...")
-        
-        # Extract suggestions and summary from the Gemini response
-        graph_suggestions = gemini_response.get("suggestions", [])
-        summary = gemini_response.get("summary", "No summary provided.")
+        upload = await read_upload(request)
+        report = report_request(upload)
         
-        # Generate PDF report with all required arguments
-        pdf_buffer = create_pdf_report(request.data, graph_suggestions, summary)
+        # Generate PDF report into a spooled temp file (in memory when small)
+        pdf_file = await report_pipeline(report)
+        size = pdf_file.seek(0, 2)
+        pdf_file.seek(0)
         
-        # Return PDF as a downloadable file
-        return Response(
-            content=pdf_buffer.getvalue(),
+        # Stream the PDF back without copying it into a single bytes object
+        return StreamingResponse(
+            iterate_in_render_executor(iter_file_chunks(pdf_file)),
             media_type="application/pdf",
-            headers={"Content-Disposition": "attachment; filename=business_report.pdf"}
+            headers={
+                "Content-Disposition": f"attachment; filename={REPORT_FILENAME}",
+                "Content-Length": str(size),
+            }
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error generating report: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/generate-report-batch", openapi_extra=upload_openapi(BatchReportRequest))
+async def generate_report_batch_endpoint(request: Request):
+    """One PDF report per value of the `partition` column, streamed back as a zip"""
+    try:
+        upload = await read_upload(request)
+        batch = batch_request(upload)
+        zip_stream = await batch_pipeline(batch)
+        return StreamingResponse(
+            iterate_in_render_executor(zip_stream),
+            media_type="application/zip",
+            headers={"Content-Disposition": "attachment; filename=reports.zip"}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating batch report: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/jobs/report", status_code=202, openapi_extra=upload_openapi(DataRequest1))
+async def create_report_job_endpoint(request: Request):
+    """Queue a PDF report; poll /jobs/{job_id} and download /jobs/{job_id}/result"""
+    upload = await read_upload(request)
+    report = report_request(upload)
+    try:
+        job = job_queue.submit("report", report_job(report))
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=503, detail="Too many queued jobs, try again later")
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "status_url": f"/jobs/{job['id']}",
+        "result_url": f"/jobs/{job['id']}/result",
+    }
+
+@app.get("/jobs/{job_id}")
+async def job_status_endpoint(job_id: str):
+    """Status and stage progress of a job"""
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return job
+
+@app.get("/jobs/{job_id}/result")
+async def job_result_endpoint(job_id: str):
+    """Download the result of a finished job"""
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    if job["status"] == FAILED:
+        raise HTTPException(status_code=409, detail=f"Job failed: {job['error']}")
+    result = job_store.get_result(job_id) if job["status"] == DONE else None
+    if result is None:
+        raise HTTPException(status_code=409, detail=f"Job is not finished (status: {job['status']})")
+    return StreamingResponse(
+        iterate_in_render_executor(result.reader()),
+        media_type=result.media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename={result.filename}",
+            "Content-Length": str(result.size),
+        }
+    )
+
+@app.get("/cache-stats")
+async def cache_stats_endpoint():
+    """Hit/miss counters of the server-side caches"""
+    return {"charts": chart_cache.stats(), "llm": llm_cache.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Stage timings, upload sizes and cache stats in the Prometheus text format"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
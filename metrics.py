@@ -0,0 +1,161 @@
+"""
+Pipeline instrumentation: stage timers, size histograms and cache stats.
+
+Metrics are exported in the Prometheus text format by /metrics. Stages timed
+while a request is being handled are also sent back in its Server-Timing
+header (streamed responses only carry the stages that finished before the
+first byte, e.g. validation, dataframe, prompt and llm for the charts zip).
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+PREFIX = "voiceviz_"
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+ROWS_BUCKETS = (10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+BYTES_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000, 1_000_000_000)
+
+# Server-Timing entries of the request being handled: list of (stage, seconds)
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple = SECONDS_BUCKETS, labelnames: tuple = ()):
+        self.name = PREFIX + name
+        self.help = help
+        self.buckets = buckets
+        self.labelnames = labelnames
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in items:
+            labels = tuple(zip(self.labelnames, key))
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', bound),))} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {series[-1]}")
+        return lines
+
+
+stage_seconds = Histogram("stage_seconds", "Duration of pipeline stages", labelnames=("stage",))
+chart_render_seconds = Histogram("chart_render_seconds", "Render time of one chart (cache misses only)",
+                                 labelnames=("type", "theme", "format"))
+request_seconds = Histogram("request_seconds", "HTTP request duration until the last byte",
+                            labelnames=("path", "status"))
+upload_bytes = Histogram("upload_bytes", "Request body size of dataset uploads", BYTES_BUCKETS, ("path",))
+upload_rows = Histogram("upload_rows", "Row count of dataset uploads", ROWS_BUCKETS, ("path",))
+
+HISTOGRAMS = [stage_seconds, chart_render_seconds, request_seconds, upload_bytes, upload_rows]
+
+
+def add_timing(stage: str, seconds: float):
+    """Record a stage duration in the histogram and in the current request's Server-Timing"""
+    stage_seconds.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def timed(stage: str):
+    """Time a block as one pipeline stage (see add_timing)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_timing(stage, time.perf_counter() - start)
+
+
+def observe_upload(path: str, size: Optional[int], rows: int):
+    if size is not None:
+        upload_bytes.observe(size, path=path)
+    upload_rows.observe(rows, path=path)
+
+
+def _cache_gauges() -> list:
+    from chart_cache import chart_cache
+    from llm_cache import llm_cache
+
+    lines = []
+    for cache, stats in (("chart", chart_cache.stats()), ("llm", llm_cache.stats())):
+        for key, value in stats.items():
+            name = f"{PREFIX}{cache}_cache_{key}"
+            lines += [f"# TYPE {name} gauge", f"{name} {int(value)}"]
+    return lines
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.render()
+    lines += _cache_gauges()
+    return "\n".join(lines) + "\n"
+
+
+def server_timing(timings: list, total: float) -> str:
+    entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware: collects the stages timed while handling a request,
+    sends them as a Server-Timing header and records the request duration
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = []
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = server_timing(timings, time.perf_counter() - start)
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            request_seconds.observe(time.perf_counter() - start, path=path, status=status)
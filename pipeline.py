@@ -0,0 +1,255 @@
+"""
+Report pipelines shared by the report endpoints and the report jobs.
+
+Stages: profiling (building the Dataset), llm, rendering (one step per
+chart) and assembling (ReportLab build). Each stage is announced through an
+optional progress callback, see jobs.Progress. With mode=fast the llm stage
+asks the rule-based recommender (recommender.py) instead of the LLM.
+
+Batch reports split one upload by a partition column and stream back a zip
+with one PDF per partition.
+"""
+import json
+import logging
+import re
+from collections import deque
+from typing import NamedTuple, Optional
+
+import pandas as pd
+from fastapi import HTTPException
+
+from chart_validation import validate_suggestions
+from concurrency import get_batch_executor, run_in_render_executor, run_in_upload_executor
+from config import BATCH_MAX_PARTITIONS, BATCH_REPORT_WORKERS
+from dataset import Dataset
+from gemini import get_batch_suggestions, get_graph_suggestions, get_graph_suggestions_
+from jobs import JobResult
+from metrics import timed
+from recommender import recommend
+from report_generator import create_pdf_report, spool_pdf_report
+from report_templates import DEFAULT_TEMPLATE, TEMPLATES
+from uploads import Upload, require_field
+from zip_stream import stream_zip
+
+logger = logging.getLogger(__name__)
+
+REPORT_FILENAME = "business_report.pdf"
+
+# Where chart suggestions come from: the LLM, or the rule-based recommender ("fast")
+MODES = ("llm", "fast")
+
+
+class ReportRequest(NamedTuple):
+    frame: pd.DataFrame
+    notes: str
+    template: str
+    mode: str = "llm"
+
+
+def _no_progress(stage, done=None, total=None):
+    pass
+
+
+def request_mode(upload: Upload) -> str:
+    """
+    The suggestion mode of an upload ("llm" unless mode=fast is given)
+
+    Raises:
+        HTTPException: 422 for unknown modes
+    """
+    mode = upload.fields.get("mode") or "llm"
+    if mode not in MODES:
+        raise HTTPException(status_code=422, detail=f"Unknown mode {mode!r}; choose from {list(MODES)}")
+    return mode
+
+
+def report_request(upload: Upload) -> ReportRequest:
+    """
+    Validate the report fields of an upload
+
+    Raises:
+        HTTPException: 422 when notes are missing or the template or mode is unknown
+    """
+    notes = require_field(upload, "notes")
+    template = upload.fields.get("template") or DEFAULT_TEMPLATE
+    if not isinstance(template, str) or template not in TEMPLATES:
+        raise HTTPException(status_code=422, detail=f"Unknown template {template!r}; choose from {sorted(TEMPLATES)}")
+    return ReportRequest(upload.frame, notes, template, request_mode(upload))
+
+
+async def suggest(dataset: Dataset, notes: Optional[str] = None, mode: str = "llm") -> dict:
+    """
+    Chart suggestions and summary for a dataset, focused on the notes when given
+
+    mode="fast" skips the LLM and asks the rule-based recommender instead.
+    LLM suggestions are checked against the dataset and repaired or dropped
+    before anything is rendered (see chart_validation.py).
+    """
+    if mode == "fast":
+        with timed("recommend"):
+            return await run_in_render_executor(recommend, dataset, notes)
+    if notes is None:
+        result = await get_graph_suggestions(dataset)
+    else:
+        result = await get_graph_suggestions_(dataset, notes)
+    with timed("chart_validation"):
+        result["suggestions"] = await run_in_render_executor(validate_suggestions, dataset, result.get("suggestions", []))
+    return result
+
+
+async def report_pipeline(report: ReportRequest, progress=_no_progress):
+    """
+    Build a PDF report
+
+    Returns:
+        Spooled temporary file holding the PDF, rewound; the caller closes it
+    """
+    progress("profiling")
+    with timed("dataframe"):
+        dataset = await run_in_upload_executor(Dataset, report.frame)
+    logger.info(f"Received report generation request ({len(dataset)} rows)")
+
+    progress("llm")
+    logger.info("Calling Gemini to get insights..." if report.mode == "llm" else "Recommending charts...")
+    gemini_response = await suggest(dataset, report.notes, report.mode)
+
+    # Extract suggestions and summary from the Gemini response
+    graph_suggestions = gemini_response.get("suggestions", [])
+    summary = gemini_response.get("summary", "No summary provided.")
+
+    logger.info("Generating PDF report...")
+    return await run_in_render_executor(
+        spool_pdf_report, dataset, graph_suggestions, summary, template=report.template, progress=progress
+    )
+
+
+def report_job(report: ReportRequest):
+    """Job body for JobQueue.submit: runs the pipeline and keeps the spooled PDF as the job result"""
+    async def run(progress):
+        pdf_file = await report_pipeline(report, progress)
+        return JobResult(pdf_file, "application/pdf", REPORT_FILENAME)
+    return run
+
+
+class BatchRequest(NamedTuple):
+    report: ReportRequest
+    partition: str
+
+
+def batch_request(upload: Upload) -> BatchRequest:
+    """
+    Validate the fields of a batch report upload
+
+    Raises:
+        HTTPException: 422 for a missing or unknown partition column (or see report_request)
+    """
+    report = report_request(upload)
+    partition = require_field(upload, "partition")
+    if partition not in report.frame.columns:
+        raise HTTPException(status_code=422, detail=f"Partition column {partition!r} is not in the data")
+    return BatchRequest(report, partition)
+
+
+def _partition_filename(label: str, used: set) -> str:
+    stem = re.sub(r"[^\w.-]+", "_", label).strip("._") or "partition"
+    filename, n = f"{stem}.pdf", 1
+    while filename in used:
+        n += 1
+        filename = f"{stem}_{n}.pdf"
+    used.add(filename)
+    return filename
+
+
+def _batch_entries(partitions: list, answers: dict, template: str):
+    """
+    Yield (filename, PDF bytes) per partition in order, then reports.json
+
+    Partition reports are built in the shared batch executor (see
+    concurrency.get_batch_executor), up to BATCH_REPORT_WORKERS ahead of the
+    one being yielded; their charts go through the render engine, so they
+    render in parallel across the worker processes.
+    """
+    index = []
+    used = set()
+    executor = get_batch_executor()
+    inflight = deque()
+
+    def build(label, dataset):
+        parts = answers[label]
+        buffer = create_pdf_report(
+            dataset, parts.get("suggestions", []), parts.get("summary", "No summary provided."), template=template
+        )
+        return buffer.getvalue()
+
+    try:
+        pending = iter(partitions)
+        while True:
+            while len(inflight) < BATCH_REPORT_WORKERS:
+                item = next(pending, None)
+                if item is None:
+                    break
+                label, dataset = item
+                inflight.append((label, dataset, executor.submit(build, label, dataset)))
+            if not inflight:
+                break
+            label, dataset, future = inflight.popleft()
+            entry = {"partition": label, "rows": len(dataset)}
+            try:
+                pdf = future.result()
+            except Exception as e:
+                logger.error(f"Error generating report for partition {label!r}: {e}", exc_info=True)
+                entry["error"] = str(e)
+            else:
+                entry["file"] = _partition_filename(label, used)
+                yield entry["file"], pdf
+            index.append(entry)
+        yield "reports.json", json.dumps(index, indent=2, default=str)
+    finally:
+        # Abandoned stream (e.g. client disconnect): drop the reports not started yet
+        for _, _, future in inflight:
+            future.cancel()
+
+
+async def batch_pipeline(batch: BatchRequest, progress=_no_progress):
+    """
+    Prepare a batch report
+
+    Returns:
+        Iterator of zip chunks (one PDF per partition plus reports.json), to be
+        driven from the render executor
+    """
+    progress("profiling")
+    with timed("dataframe"):
+        dataset = await run_in_upload_executor(Dataset, batch.report.frame)
+        partitions = await run_in_render_executor(dataset.partitions, batch.partition)
+    if len(partitions) > BATCH_MAX_PARTITIONS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"{len(partitions)} partitions in {batch.partition!r}, at most {BATCH_MAX_PARTITIONS} are allowed",
+        )
+    labelled, labels = [], set()
+    for value, part in partitions:
+        label, n = str(value), 1
+        while label in labels:  # e.g. 1 and "1"
+            n += 1
+            label = f"{value}_{n}"
+        labels.add(label)
+        labelled.append((label, part))
+    partitions = labelled
+    logger.info(f"Received batch report request ({len(dataset)} rows, {len(partitions)} partitions)")
+
+    progress("llm")
+    if batch.report.mode == "fast":
+        answers = {label: await suggest(part, batch.report.notes, "fast") for label, part in partitions}
+    else:
+        answers = await get_batch_suggestions(batch.partition, partitions, batch.report.notes)
+        with timed("chart_validation"):
+            for label, part in partitions:
+                answer = answers.get(label)
+                if answer is not None:
+                    answer["suggestions"] = await run_in_render_executor(
+                        validate_suggestions, part, answer.get("suggestions", [])
+                    )
+
+    progress("rendering")
+    return stream_zip(_batch_entries(partitions, answers, batch.report.template))
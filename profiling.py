@@ -0,0 +1,127 @@
+"""
+Bounded-size statistical profile of a dataset, sent to the LLM instead of raw rows.
+
+The profile has the same size whether the upload has 100 rows or 10 million:
+column count, top-k lists, correlation pairs, sample rows and string lengths
+are all capped.
+"""
+import pandas as pd
+
+from dataset import Dataset, as_dataset
+
+MAX_COLUMNS = 40
+TOP_K = 5
+MAX_CORRELATIONS = 10
+SAMPLE_ROWS = 10
+MAX_STRING = 40
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def _clip(value):
+    """Make a scalar JSON friendly and bounded in length"""
+    if value is None or (not isinstance(value, (list, dict)) and pd.isna(value)):
+        return None
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float):
+        return round(value, 4)
+    if isinstance(value, (int, bool)):
+        return value
+    text = str(value)
+    return text if len(text) <= MAX_STRING else text[:MAX_STRING - 3] + "..."
+
+
+def _profile_column(dataset: Dataset, col) -> dict:
+    series = dataset.frame[col]
+    info = {
+        "name": str(col),
+        "dtype": str(series.dtype),
+        "non_null": int(series.notna().sum()),
+    }
+    unique = dataset.unique_counts[col]
+    if unique is None:  # unhashable cells such as nested lists
+        return info
+    info["unique"] = unique
+
+    if pd.api.types.is_bool_dtype(series):
+        info["kind"] = "categorical"
+    elif pd.api.types.is_numeric_dtype(series):
+        info["kind"] = "numeric"
+        desc = series.quantile(list(QUANTILES))
+        info.update({
+            "min": _clip(series.min()),
+            "max": _clip(series.max()),
+            "mean": _clip(series.mean()),
+            "std": _clip(series.std()),
+            "quantiles": {f"p{int(q * 100)}": _clip(v) for q, v in desc.items()},
+        })
+        return info
+    elif col in dataset.dates:
+        dates = dataset.dates[col]
+        info["kind"] = "datetime"
+        info.update({"min": _clip(dates.min()), "max": _clip(dates.max())})
+        return info
+    else:
+        info["kind"] = "categorical"
+
+    top = series.value_counts().head(TOP_K)
+    info["top"] = [[_clip(k), int(v)] for k, v in top.items()]
+    return info
+
+
+def _top_correlations(corr: pd.DataFrame) -> list:
+    if corr.shape[1] < 2:
+        return []
+    pairs = []
+    cols = list(corr.columns)
+    for i, a in enumerate(cols):
+        for b in cols[i + 1:]:
+            value = corr.at[a, b]
+            if pd.notna(value):
+                pairs.append((abs(value), a, b, value))
+    pairs.sort(reverse=True)
+    return [[str(a), str(b), round(float(v), 3)] for _, a, b, v in pairs[:MAX_CORRELATIONS]]
+
+
+def _stratified_sample(df: pd.DataFrame, profiles: list) -> list:
+    """A few representative rows, spread across the lowest-cardinality category when there is one"""
+    if df.empty:
+        return []
+    strata = [
+        (p["unique"], col) for col, p in zip(df.columns, profiles)
+        if p.get("kind") == "categorical" and 1 < p.get("unique", 0) <= SAMPLE_ROWS
+    ]
+    if strata:
+        col = min(strata, key=lambda item: item[0])[1]
+        per_group = max(1, SAMPLE_ROWS // df[col].nunique())
+        sample = df.groupby(col, sort=False, group_keys=False).head(per_group).head(SAMPLE_ROWS)
+    else:
+        step = max(1, len(df) // SAMPLE_ROWS)
+        sample = df.iloc[::step].head(SAMPLE_ROWS)
+    return [{str(k): _clip(v) for k, v in row.items()} for row in sample.to_dict(orient="records")]
+
+
+def profile_dataset(data) -> dict:
+    """
+    Summarise a dataset for the LLM prompt
+
+    Args:
+        data: Dataset, DataFrame or list of row dicts
+
+    Returns:
+        dict: schema, dtypes, cardinalities, numeric quantiles, top categories,
+        date ranges, strongest correlations and a small stratified sample
+    """
+    dataset = as_dataset(data)
+    df = dataset.frame
+    columns = list(df.columns[:MAX_COLUMNS])
+    profiles = [_profile_column(dataset, col) for col in columns]
+    numeric_cols = [col for col, p in zip(columns, profiles) if p.get("kind") == "numeric"]
+    return {
+        "rows": int(len(df)),
+        "column_count": int(df.shape[1]),
+        "columns_omitted": max(0, int(df.shape[1]) - MAX_COLUMNS),
+        "columns": profiles,
+        "correlations": _top_correlations(dataset.corr.loc[numeric_cols, numeric_cols]) if numeric_cols else [],
+        "sample": _stratified_sample(df[columns], profiles),
+    }
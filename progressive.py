@@ -0,0 +1,149 @@
+"""
+Progressive chart stream for /generate-graphs/stream (Server-Sent Events).
+
+The LLM call starts right away and its answer is streamed. While it is in
+flight, the charts the rule-based recommender picks from the schema alone
+(trend, breakdowns, distributions, correlations) are rendered and sent.
+Each LLM suggestion is checked against the dataset (chart_validation.py)
+and rendered as soon as it is complete in the stream (minus the charts
+already sent), and the LLM summary comes last, so the client sees the
+first charts after the local render time instead of after the LLM round
+trip, and the LLM charts without waiting for the summary.
+
+Events (data is JSON):
+
+- chart: index, source ("local" or "llm"), title, type, insight, image
+  (base64 PNG) and the render metadata (rows, render_mode, format)
+- chart_error: source, title, error
+- summary: source, summary
+- error: detail (the LLM call failed; the local summary is sent instead)
+- done: charts (number of chart events sent)
+"""
+import asyncio
+import base64
+import json
+import logging
+
+from chart_validation import ChartValidator
+from concurrency import iterate_in_render_executor, run_in_render_executor
+from dataset import Dataset
+from gemini import stream_graph_suggestions
+from graph_gen import THEME_ZIP
+from metrics import timed
+from recommender import recommend
+from render_engine import iter_render_charts
+
+logger = logging.getLogger(__name__)
+
+# Comment lines sent while waiting on the LLM, so proxies keep the stream open
+KEEPALIVE_SECONDS = 15
+
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def chart_signature(chart: dict) -> tuple:
+    """Charts with the same type and columns draw the same picture"""
+    return (chart.get("type"),) + tuple(str(chart.get(key)) for key in ("x", "y", "labels", "values", "size"))
+
+
+async def _chart_events(dataset: Dataset, charts: list[dict], source: str, sent: list):
+    """Render charts and yield one event per chart; appends the signature of every chart sent"""
+    stream = iter_render_charts(dataset, charts, theme=THEME_ZIP, dpi=100)
+    async for chart, result in iterate_in_render_executor(stream):
+        index = len(sent)
+        title = chart.get("title", f"graph_{index}")
+        if result.error is not None:
+            yield sse("chart_error", {"source": source, "title": title, "error": str(result.error)})
+            continue
+        if result.image is None:
+            continue
+        sent.append(chart_signature(chart))
+        yield sse("chart", {
+            "index": index,
+            "source": source,
+            "title": title,
+            "type": chart.get("type"),
+            "insight": chart.get("insight", ""),
+            "image": base64.b64encode(result.image).decode("ascii"),
+            **(result.meta or {}),
+        })
+
+
+async def _pump(dataset: Dataset, queue: asyncio.Queue):
+    """Move the streamed LLM answer into the queue; ("error", exception) on failure, then ("end", None)"""
+    try:
+        async for item in stream_graph_suggestions(dataset):
+            queue.put_nowait(item)
+    except Exception as e:
+        queue.put_nowait(("error", e))
+    finally:
+        queue.put_nowait(("end", None))
+
+
+async def graph_events(dataset: Dataset, mode: str = "llm"):
+    """
+    Yield the SSE stream of a progressive /generate-graphs request
+
+    Args:
+        dataset: Uploaded data
+        mode: "llm" (local charts first, then the LLM's) or "fast" (local charts only)
+    """
+    queue = asyncio.Queue()
+    llm = asyncio.create_task(_pump(dataset, queue)) if mode == "llm" else None
+    sent = []
+    try:
+        with timed("recommend"):
+            local = await run_in_render_executor(recommend, dataset)
+        validator = ChartValidator(dataset)
+        async for event in _chart_events(dataset, local["suggestions"], "local", sent):
+            yield event
+
+        if llm is None:
+            yield sse("summary", {"source": "local", "summary": local["summary"]})
+            yield sse("done", {"charts": len(sent)})
+            return
+
+        summary = error = None
+        finished = False
+        while not finished:
+            try:
+                items = [await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)]
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            # Suggestions that arrived while the previous ones rendered are rendered together
+            while not queue.empty():
+                items.append(queue.get_nowait())
+            suggestions = []
+            for kind, value in items:
+                if kind == "suggestion":
+                    suggestions.append(value)
+                elif kind == "summary":
+                    summary = value
+                elif kind == "error":
+                    error = value
+                else:
+                    finished = True
+            charts = []
+            if suggestions:
+                with timed("chart_validation"):
+                    repaired = await run_in_render_executor(validator.validate_all, suggestions)
+                for chart in repaired:
+                    if chart_signature(chart) not in sent and chart not in charts:
+                        charts.append(chart)
+            async for event in _chart_events(dataset, charts, "llm", sent):
+                yield event
+
+        if error is not None:
+            logger.error(f"LLM call failed during a progressive request: {error}")
+            yield sse("error", {"detail": str(error)})
+        if summary is None:
+            yield sse("summary", {"source": "local", "summary": local["summary"]})
+        else:
+            yield sse("summary", {"source": "llm", "summary": summary})
+        yield sse("done", {"charts": len(sent)})
+    finally:
+        if llm is not None and not llm.done():
+            llm.cancel()
@@ -0,0 +1,190 @@
+"""
+Rule-based chart recommender: a zero-latency alternative to the LLM.
+
+Columns are classified from their dtype and cardinality (measures, dates,
+categories, identifiers), then a fixed set of rules picks the charts an
+analyst would reach for first:
+
+- line of the main measure over the date column
+- bar of the main measure by the most useful category
+- pie of the category shares when there are only a few categories
+- box of the measure per category when categories have many rows each
+- histogram of the main measure
+- scatter of the most strongly correlated pair of measures
+- heatmap of the correlations when there are three or more measures
+
+Columns named in the user's notes are preferred. Insights and the summary
+are plain facts computed from the data. The result has the same shape as a
+parsed LLM response ({"suggestions", "summary"}).
+"""
+import re
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from dataset import Dataset, as_dataset
+
+MAX_CATEGORIES = 30
+MAX_PIE_CATEGORIES = 6
+# Box plots need a few rows per category to say more than a bar chart
+MIN_ROWS_PER_BOX = 20
+MAX_SUGGESTIONS = 6
+# Measure names that usually hold the headline number, most preferred first
+MEASURE_HINTS = ("revenue", "sales", "total", "amount", "profit", "price", "close", "value", "cost", "quantity", "count")
+
+
+def _mentioned(col, notes: str) -> bool:
+    return bool(notes) and re.search(rf"\b{re.escape(str(col).lower())}\b", notes) is not None
+
+
+def _is_identifier(dataset: Dataset, col) -> bool:
+    """Row ids and codes: named like an id, or integers unique per row"""
+    name = str(col).lower()
+    if name == "id" or name.endswith(("_id", " id")) or name.startswith("id_"):
+        return True
+    series = dataset.frame[col]
+    unique = dataset.unique_counts[col]
+    return pd.api.types.is_integer_dtype(series) and len(series) > MAX_CATEGORIES and unique == len(series)
+
+
+def classify_columns(dataset: Dataset) -> dict:
+    """
+    Split the columns by role
+
+    Returns:
+        dict with lists "measures", "dates" and "categories"; categories are
+        sorted by cardinality (fewest distinct values first)
+    """
+    df = dataset.frame
+    measures, dates, categories = [], [], []
+    for col in df.columns:
+        series = df[col]
+        unique = dataset.unique_counts[col]
+        if unique is None or unique == 0:
+            continue
+        if pd.api.types.is_bool_dtype(series):
+            categories.append(col)
+        elif pd.api.types.is_numeric_dtype(series):
+            if not _is_identifier(dataset, col) and unique > 1:
+                measures.append(col)
+        elif col in dataset.dates:
+            dates.append(col)
+        elif 1 < unique <= MAX_CATEGORIES:
+            categories.append(col)
+    categories.sort(key=lambda col: dataset.unique_counts[col])
+    return {"measures": measures, "dates": dates, "categories": categories}
+
+
+def _pick(columns: list, notes: str, hints: tuple = ()) -> Optional[object]:
+    """Column named in the notes, else the first one matching a hint, else the first one"""
+    if not columns:
+        return None
+    for col in columns:
+        if _mentioned(col, notes):
+            return col
+    for hint in hints:
+        for col in columns:
+            if hint in str(col).lower():
+                return col
+    return columns[0]
+
+
+def _fmt(value) -> str:
+    value = float(value)
+    return f"{value:,.0f}" if abs(value) >= 1000 or value == int(value) else f"{value:,.2f}"
+
+
+def _trend_insight(dataset: Dataset, date_col, measure) -> Optional[str]:
+    frame = pd.DataFrame({"date": dataset.dates[date_col], "value": dataset.frame[measure]}).dropna()
+    if len(frame) < 2:
+        return None
+    frame = frame.sort_values("date")
+    half = len(frame) // 2
+    first, second = frame["value"].iloc[:half].mean(), frame["value"].iloc[half:].mean()
+    if not first:
+        return f"{measure} averages {_fmt(frame['value'].mean())} over the period."
+    change = (second - first) / abs(first)
+    direction = "rose" if change > 0.02 else "fell" if change < -0.02 else "stayed roughly flat"
+    detail = f" by {abs(change):.0%}" if direction != "stayed roughly flat" else ""
+    return f"Average {measure} {direction}{detail} from the first to the second half of the period."
+
+
+def _category_totals(dataset: Dataset, category, measure) -> pd.Series:
+    return dataset.frame.groupby(category, sort=False)[measure].sum().sort_values(ascending=False)
+
+
+def recommend(data, notes: Optional[str] = None) -> dict:
+    """
+    Pick charts for a dataset without calling the LLM
+
+    Args:
+        data: Dataset (or DataFrame / list of row dicts)
+        notes: Optional user focus notes; columns they name are preferred
+
+    Returns:
+        dict: {"suggestions": [...], "summary": str}, like extract_response_parts
+    """
+    dataset = as_dataset(data)
+    notes = (notes or "").lower()
+    roles = classify_columns(dataset)
+    measures, dates, categories = roles["measures"], roles["dates"], roles["categories"]
+    measure = _pick(measures, notes, MEASURE_HINTS)
+    date_col = _pick(dates, notes)
+    category = _pick(categories, notes)
+
+    suggestions = []
+    facts = [f"The dataset has {len(dataset):,} rows and {dataset.frame.shape[1]} columns."]
+
+    if measure is not None and date_col is not None:
+        trend = _trend_insight(dataset, date_col, measure)
+        suggestions.append({"type": "line", "x": date_col, "y": measure, "title": f"{measure} over {date_col}",
+                            "insight": trend or f"How {measure} develops over {date_col}."})
+        if trend:
+            facts.append(trend)
+
+    if measure is not None and category is not None:
+        totals = _category_totals(dataset, category, measure)
+        grand_total = totals.sum()
+        if len(totals):
+            top, top_value = totals.index[0], totals.iloc[0]
+            share = f" ({top_value / grand_total:.0%} of the total)" if grand_total > 0 and top_value > 0 else ""
+            bar_insight = f"{category} {top} leads {measure} with {_fmt(top_value)}{share}."
+            facts.append(bar_insight)
+        else:
+            bar_insight = f"Total {measure} for each {category}."
+        suggestions.append({"type": "bar", "x": category, "y": measure, "title": f"{measure} by {category}",
+                            "insight": bar_insight})
+
+        count = dataset.unique_counts[category]
+        if count <= MAX_PIE_CATEGORIES and len(totals) and (totals >= 0).all() and grand_total > 0:
+            suggestions.append({"type": "pie", "labels": category, "values": measure,
+                                "title": f"Share of {measure} by {category}",
+                                "insight": f"{len(totals)} {category} values share the total of {_fmt(grand_total)}."})
+        elif len(dataset) >= MIN_ROWS_PER_BOX * count:
+            suggestions.append({"type": "box", "x": category, "y": measure, "title": f"{measure} spread by {category}",
+                                "insight": f"Distribution of individual {measure} values within each {category}."})
+
+    if measure is not None:
+        values = dataset.frame[measure].dropna()
+        if len(values):
+            suggestions.append({"type": "hist", "x": measure, "title": f"Distribution of {measure}",
+                                "insight": f"{measure} has a median of {_fmt(values.median())}, "
+                                           f"ranging from {_fmt(values.min())} to {_fmt(values.max())}."})
+
+    if len(measures) >= 2:
+        corr = dataset.corr.loc[measures, measures].abs()
+        pairs = corr.where(np.triu(np.ones(corr.shape, dtype=bool), k=1)).stack()
+        if len(pairs):
+            (a, b), strength = pairs.idxmax(), pairs.max()
+            r = dataset.corr.at[a, b]
+            suggestions.append({"type": "scatter", "x": a, "y": b, "title": f"{a} vs {b}",
+                                "insight": f"{a} and {b} have a correlation of {r:.2f}."})
+            if strength >= 0.5:
+                facts.append(f"{a} and {b} move together (correlation {r:.2f}).")
+
+    if len(measures) >= 3:
+        suggestions.append({"type": "heatmap", "title": "Correlations between measures",
+                            "insight": "Which measures move together."})
+
+    return {"suggestions": suggestions[:MAX_SUGGESTIONS], "summary": " ".join(facts)}
@@ -0,0 +1,187 @@
+"""
+Vectorized pre-plot reduction of large datasets.
+
+Each chart type gets a reduction that keeps what the eye can see in the
+figure's pixel budget, so render time is bounded by the figure size rather
+than the row count:
+
+- bar / pie: group by category and sum; beyond MAX_BAR_CATEGORIES the
+  smallest are summed into one "Other" category
+- box: per-group quantile grid that preserves the box statistics
+- line / area: min/max decimation per pixel column
+- scatter / bubble: deterministic random sample, or above a row threshold a
+  NumPy-binned 2D density grid that is drawn as an image
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+MAX_BAR_CATEGORIES = 50
+MAX_BOX_GROUPS = 50
+BOX_QUANTILES = np.linspace(0.0, 1.0, 201)
+# Box plots up to this many rows are drawn from the raw values
+MIN_BOX_ROWS_TO_REDUCE = 1000
+# Bins of the scatter/bubble density grid (x, y)
+DENSITY_BINS = (120, 60)
+
+
+def _is_numeric(frame: pd.DataFrame, col) -> bool:
+    return col in frame.columns and pd.api.types.is_numeric_dtype(frame[col])
+
+
+def _category_fields(chart_config: dict) -> tuple:
+    if chart_config.get("type") == "bar":
+        return chart_config.get("x"), chart_config.get("y")
+    if chart_config.get("type") == "pie":
+        return chart_config.get("labels"), chart_config.get("values")
+    return None, None
+
+
+def _folded(categories: int, limit: int) -> int:
+    """Categories summed into "Other" when there are `categories` (0: all are drawn)"""
+    return categories - (limit - 1) if categories > limit else 0
+
+
+def aggregate_categories(frame: pd.DataFrame, key, value, limit: int = MAX_BAR_CATEGORIES) -> pd.DataFrame:
+    """
+    Sum value per category (when categories repeat), in first-seen order
+
+    Beyond `limit` categories the largest limit - 1 are kept and the rest are
+    summed into a last "Other (n more)" category, so the bars still add up to
+    the total; the category labels become text then.
+    """
+    if not _is_numeric(frame, value) or key not in frame.columns or key == value:
+        return frame
+    if not frame[key].duplicated().any() and len(frame) <= limit:
+        return frame
+    totals = frame.groupby(key, sort=False, dropna=False)[value].sum()
+    folded = _folded(len(totals), limit)
+    if folded:
+        kept = totals.index.isin(totals.abs().nlargest(limit - 1).index)
+        index = pd.Index([*totals.index[kept].astype(str), f"Other ({folded:,} more)"], name=key)
+        totals = pd.Series([*totals[kept], totals[~kept].sum()], index=index, name=value)
+    return totals.reset_index()
+
+
+def folded_categories(frame: pd.DataFrame, chart_config: dict, distinct: Optional[dict] = None,
+                      limit: int = MAX_BAR_CATEGORIES) -> int:
+    """
+    How many categories of a bar or pie chart reduce_for_chart sums into its
+    "Other" category (0 for other charts and when all categories are drawn)
+
+    Args:
+        frame: Columns the chart reads
+        chart_config: Chart suggestion
+        distinct: Known distinct (non-null) value counts per column (e.g.
+            Dataset.unique_counts); skips counting when there are clearly too
+            few categories to fold
+    """
+    key, value = _category_fields(chart_config)
+    if not key or not _is_numeric(frame, value) or key not in frame.columns or key == value:
+        return 0
+    known = (distinct or {}).get(key)
+    if known is not None and known < limit:  # a null category adds at most one
+        return 0
+    return _folded(int(frame[key].nunique(dropna=False)), limit)
+
+
+def box_quantiles(frame: pd.DataFrame, key, value, limit: int = MAX_BOX_GROUPS) -> pd.DataFrame:
+    """
+    Replace each group by a grid of its quantiles
+
+    Median, quartiles, whisker ends and extremes come out (nearly) identical to
+    the full data, while every group shrinks to len(BOX_QUANTILES) points.
+    """
+    if not _is_numeric(frame, value) or key not in frame.columns or key == value:
+        return frame
+    grouped = frame[[key, value]].dropna().groupby(key, sort=False)
+    sizes = grouped.size()
+    if len(sizes) > limit:
+        keep = sizes.nlargest(limit).index
+        grouped = frame[frame[key].isin(keep)][[key, value]].dropna().groupby(key, sort=False)
+    quantiles = grouped[value].quantile(BOX_QUANTILES)
+    return quantiles.reset_index(level=0).reset_index(drop=True)
+
+
+def decimate_minmax(frame: pd.DataFrame, value, max_points: int) -> pd.DataFrame:
+    """
+    Keep the first/last row and the min and max row of `value` in each of
+    max_points/2 equal-width position buckets, in the original order
+    """
+    n = len(frame)
+    if n <= max_points or not _is_numeric(frame, value):
+        return frame
+    buckets = max(1, max_points // 2)
+    y = pd.Series(frame[value].to_numpy(dtype=float)).dropna()
+    bucket = y.index.to_numpy() * buckets // n
+    grouped = y.groupby(bucket)
+    keep = np.unique(np.concatenate([
+        grouped.idxmin().to_numpy(),
+        grouped.idxmax().to_numpy(),
+        [0, n - 1],
+    ]).astype(np.int64))
+    return frame.iloc[keep]
+
+
+def sample_points(frame: pd.DataFrame, max_points: int) -> pd.DataFrame:
+    """Deterministic uniform sample, in the original row order"""
+    if len(frame) <= max_points:
+        return frame
+    return frame.sample(n=max_points, random_state=0).sort_index()
+
+
+def uses_density(frame: pd.DataFrame, chart_config: dict, threshold: int) -> bool:
+    """Whether a scatter/bubble chart switches to the binned density view"""
+    if chart_config.get("type") not in ("scatter", "bubble") or threshold <= 0 or len(frame) <= threshold:
+        return False
+    return _is_numeric(frame, chart_config.get("x")) and _is_numeric(frame, chart_config.get("y"))
+
+
+def density_grid(frame: pd.DataFrame, x, y, weights=None, bins=DENSITY_BINS) -> dict:
+    """
+    Bin x/y into a 2D histogram (summing `weights` per bin when given)
+
+    Returns:
+        dict with counts (x bins by y bins), xedges, yedges and the number of points binned
+    """
+    cols = [x, y] + ([weights] if weights and _is_numeric(frame, weights) else [])
+    data = frame[cols].dropna()
+    counts, xedges, yedges = np.histogram2d(
+        data[x].to_numpy(dtype=float),
+        data[y].to_numpy(dtype=float),
+        bins=bins,
+        weights=data[cols[2]].to_numpy(dtype=float) if len(cols) == 3 else None,
+    )
+    return {"counts": counts, "xedges": xedges, "yedges": yedges, "points": int(len(data)), "weighted": len(cols) == 3}
+
+
+def reduce_for_chart(frame: pd.DataFrame, chart_config: dict, max_points: int) -> pd.DataFrame:
+    """
+    Reduce the columns a chart reads to what its figure can show
+
+    Scatter/bubble charts that switch to the density view are handled by
+    density_grid instead (see uses_density).
+
+    Args:
+        frame: Columns the chart reads
+        chart_config: Chart suggestion
+        max_points: Pixel budget of the figure (its width in pixels)
+    """
+    gtype = chart_config.get("type", "line")
+    x, y = chart_config.get("x"), chart_config.get("y")
+
+    if gtype == "bar" and x and y:
+        # Always summed per category, so the chart means the same at any row count
+        return aggregate_categories(frame, x, y)
+    if gtype == "pie":
+        labels, values = chart_config.get("labels"), chart_config.get("values")
+        if labels and values:
+            return aggregate_categories(frame, labels, values)
+    if gtype == "box" and x and y and len(frame) > MIN_BOX_ROWS_TO_REDUCE:
+        return box_quantiles(frame, x, y)
+    if gtype in ("line", "area") and y:
+        return decimate_minmax(frame, y, max(2, 2 * max_points))
+    if gtype in ("scatter", "bubble"):
+        return sample_points(frame, max_points)
+    return frame
@@ -0,0 +1,237 @@
+"""
+Chart rendering engine backed by a pool of worker processes.
+
+Each worker imports matplotlib (Agg backend) and seaborn once, then renders
+(DataFrame slice, chart config, theme) jobs to PNG bytes. Charts of a single
+request and of concurrent requests therefore render in parallel across cores.
+When the pool is disabled (RENDER_PROCESSES=0) or cannot be used, charts are
+rendered in-process instead. Render time per chart is measured where it
+is rendered and recorded by chart type (see metrics.py). Charts found in
+the chart cache are not rendered at all; the others are reduced to the
+figure's pixel budget (see reduction.py) before being shipped to a worker. Scatter/bubble charts above
+SCATTER_DENSITY_THRESHOLD rows are binned here and only the 2D grid is shipped.
+With vector=True charts come back as SVG, except dense ones (see _rasterize).
+"""
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import NamedTuple, Optional
+
+import pandas as pd
+
+from chart_cache import chart_cache, chart_key
+from config import PNG_PALETTE_COLORS, RENDER_PROCESSES, SCATTER_DENSITY_THRESHOLD, VECTOR_MAX_MARKERS
+from dataset import Dataset, as_dataset
+from graph_gen import THEME_PDF, pixel_width, render_png, render_svg
+from metrics import chart_render_seconds
+from reduction import density_grid, folded_categories, reduce_for_chart, uses_density
+
+logger = logging.getLogger(__name__)
+
+
+class RenderResult(NamedTuple):
+    image: Optional[bytes]
+    error: Optional[Exception] = None
+    # Chart metadata: input row count, render_mode ("points" or "density"),
+    # image format ("png" or "svg") and, for bar/pie charts with too many
+    # categories, categories_folded (how many were summed into "Other")
+    meta: Optional[dict] = None
+
+
+RENDERERS = {"png": render_png, "svg": render_svg}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _warm_worker():
+    """Process initializer: pay the matplotlib/seaborn import cost once per worker"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import seaborn  # noqa: F401
+    import graph_gen  # noqa: F401
+
+
+def _get_pool():
+    global _pool
+    if RENDER_PROCESSES <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            try:
+                # spawn, not fork: the server process runs threads (uvicorn, render executor)
+                _pool = ProcessPoolExecutor(
+                    max_workers=RENDER_PROCESSES,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_worker,
+                )
+            except (OSError, ValueError) as e:
+                logger.warning(f"Render process pool unavailable, rendering in-process: {e}")
+                return None
+        return _pool
+
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _job_frame(dataset: Dataset, chart_config: dict) -> pd.DataFrame:
+    """Slice the dataset down to the columns a chart actually reads"""
+    if chart_config.get("type") == "heatmap":
+        return dataset.numeric
+    df = dataset.frame
+    columns = []
+    for key in ("x", "y", "labels", "values", "size"):
+        col = chart_config.get(key)
+        if isinstance(col, str) and col in df.columns and col not in columns:
+            columns.append(col)
+    frame = df[columns]
+    x = chart_config.get("x")
+    if chart_config.get("type") in ("line", "area") and x in columns and x in dataset.dates and frame[x].dtype == object:
+        # Date text on the x axis: plot the parsed dates (one date axis instead of a tick per distinct string)
+        frame = frame.assign(**{x: dataset.dates[x]})
+    return frame
+
+
+def _rasterize(chart_config: dict, frame: pd.DataFrame, density: bool) -> bool:
+    """Charts with too many elements to embed as vector drawings"""
+    if density or chart_config.get("type") == "heatmap":
+        return True
+    return chart_config.get("type") in ("scatter", "bubble", "line", "area") and len(frame) > VECTOR_MAX_MARKERS
+
+
+def _timed_render(fmt, df, chart_config, theme, dpi, index):
+    """Render one chart; returns (image bytes, seconds spent rendering)"""
+    start = time.perf_counter()
+    image = RENDERERS[fmt](df, chart_config, theme, dpi, index)
+    return image, time.perf_counter() - start
+
+
+def _render_inprocess(fmt, df, chart_config, theme, dpi, index):
+    try:
+        return _timed_render(fmt, df, chart_config, theme, dpi, index)
+    except Exception as e:
+        return RenderResult(None, e)
+
+
+def iter_render_charts(data, chart_configs: list[dict], theme: str = THEME_PDF, dpi: int = 200, window: Optional[int] = None,
+                       vector: bool = False):
+    """
+    Render charts and yield them in order as each one becomes available
+
+    At most `window` charts are submitted ahead of the one being yielded
+    (default: one per worker process), which bounds how many rendered images
+    are held in memory at once. Cached charts are served without rendering.
+
+    Args:
+        data: Dataset (or DataFrame / list of row dicts)
+        vector: Render SVG instead of PNG where the chart is not too dense
+
+    Yields:
+        (chart_config, RenderResult)
+    """
+    dataset = as_dataset(data)
+    pool = _get_pool()
+    if window is None:
+        window = max(1, RENDER_PROCESSES)
+    digests = dataset.column_digests
+
+    def submit(i, c):
+        nonlocal pool
+        frame = _job_frame(dataset, c)
+        density = uses_density(frame, c, SCATTER_DENSITY_THRESHOLD)
+        fmt = "svg" if vector and not _rasterize(c, frame, density) else "png"
+        meta = {"rows": len(frame), "render_mode": "density" if density else "points", "format": fmt}
+        folded = folded_categories(frame, c, dataset.unique_counts)
+        if folded:
+            meta["categories_folded"] = folded
+        key = chart_key(frame, c, theme, dpi, digests, palette=PNG_PALETTE_COLORS if theme != THEME_PDF else 0,
+                        density=density, fmt=fmt)
+        image = chart_cache.get(key, fmt) if key else None
+        if image is not None:
+            return i, c, frame, key, meta, RenderResult(image, meta=meta)
+        # Only misses pay for the reduction; keys are taken on the full columns
+        job_config = c
+        if density:
+            job_config = {**c, "density": density_grid(frame, c["x"], c["y"], c.get("size") if c.get("type") == "bubble" else None)}
+            frame = frame.iloc[:0]
+        else:
+            frame = reduce_for_chart(frame, c, pixel_width(theme, dpi))
+        if pool is None:
+            return i, job_config, frame, key, meta, None
+        try:
+            return i, job_config, frame, key, meta, pool.submit(_timed_render, fmt, frame, job_config, theme, dpi, i)
+        except (BrokenProcessPool, RuntimeError) as e:
+            logger.warning(f"Render process pool failed, rendering in-process: {e}")
+            _discard_pool(pool)
+            pool = None
+            return i, job_config, frame, key, meta, None
+
+    def collect(job):
+        nonlocal pool
+        i, c, frame, key, meta, pending = job
+        if isinstance(pending, RenderResult):
+            return pending
+        if pending is None:
+            result = _render_inprocess(meta["format"], frame, c, theme, dpi, i)
+        else:
+            try:
+                result = pending.result()
+            except (BrokenProcessPool, CancelledError) as e:
+                logger.warning(f"Render worker unavailable, rendering in-process: {e!r}")
+                if pool is not None:
+                    _discard_pool(pool)
+                    pool = None
+                result = _render_inprocess(meta["format"], frame, c, theme, dpi, i)
+            except Exception as e:
+                result = RenderResult(None, e)
+        if not isinstance(result, RenderResult):
+            image, seconds = result
+            chart_render_seconds.observe(seconds, type=c.get("type", "line"), theme=theme, format=meta["format"])
+            result = RenderResult(image)
+        if key and result.image is not None:
+            chart_cache.put(key, result.image, meta["format"])
+        return result._replace(meta=meta)
+
+    inflight = deque()
+    for i, c in enumerate(chart_configs):
+        inflight.append((c, submit(i, c)))
+        if len(inflight) >= window:
+            c, job = inflight.popleft()
+            yield c, collect(job)
+    while inflight:
+        c, job = inflight.popleft()
+        yield c, collect(job)
+
+
+def render_charts(data, chart_configs: list[dict], theme: str = THEME_PDF, dpi: int = 200, vector: bool = False) -> list[RenderResult]:
+    """
+    Render several charts in parallel, serving repeats from the chart cache
+
+    Returns:
+        list[RenderResult]: one result per config, in the same order
+    """
+    window = max(1, len(chart_configs))
+    return [result for _, result in iter_render_charts(data, chart_configs, theme, dpi, window=window, vector=vector)]
+
+
+def render_chart(data, chart_config: dict, theme: str = THEME_PDF, dpi: int = 200, vector: bool = False) -> RenderResult:
+    """Render one chart through the engine"""
+    return render_charts(data, [chart_config], theme, dpi, vector=vector)[0]
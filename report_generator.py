@@ -407,103 +407,133 @@
 #     return buffer
 
 import io
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4, letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch, cm
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, PageBreak, Table, TableStyle
-from reportlab.lib.enums import TA_JUSTIFY, TA_LEFT, TA_CENTER
-import matplotlib.pyplot as plt
-import pandas as pd
+import os
+import tempfile
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, PageBreak, Table
 from datetime import datetime
 from io import BytesIO
 import logging
 
+from config import PDF_SPOOL_MEMORY_MB, PDF_VECTOR_CHARTS
+from dataset import as_dataset
+from metrics import timed
+from report_templates import DEFAULT_TEMPLATE, get_template
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
-def create_pdf_report(data, suggestions, summary):
+
+def svglib_available() -> bool:
+    try:
+        import svglib.svglib  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+_svg_fonts_registered = False
+
+
+def _register_svg_fonts():
+    """Map matplotlib's default font onto Helvetica so svglib skips its per-text font lookup"""
+    global _svg_fonts_registered
+    if _svg_fonts_registered:
+        return
+    from svglib.svglib import register_font
+
+    register_font("DejaVu Sans", rlgFontName="Helvetica")
+    register_font("DejaVu Sans", weight="bold", rlgFontName="Helvetica-Bold")
+    _svg_fonts_registered = True
+
+
+def svg_flowable(svg: bytes, max_width: float, max_height: float):
+    """Convert an SVG chart to a ReportLab Drawing scaled to fit the given box"""
+    from svglib.svglib import svg2rlg
+
+    _register_svg_fonts()
+    drawing = svg2rlg(BytesIO(svg))
+    scale = min(max_width / drawing.width, max_height / drawing.height)
+    drawing.scale(scale, scale)
+    drawing.width *= scale
+    drawing.height *= scale
+    return drawing
+
+
+def _render_report_charts(dataset, charts: list[dict], chart_dir: str, vector: bool, progress=None) -> list:
+    """
+    Render all charts of a report at once through the render engine
+
+    Charts go to the worker processes together, so the phase takes about as
+    long as the slowest chart. PNGs are written to chart_dir as they arrive.
+
+    Returns:
+        list of (RenderResult, PNG path or None), in chart order
+    """
+    # Import the render engine inside the function to avoid circular imports
+    from graph_gen import THEME_PDF
+    from render_engine import iter_render_charts
+
+    if progress is not None:
+        progress("rendering", 0, len(charts))
+    rendered = []
+    results = iter_render_charts(dataset, charts, theme=THEME_PDF, dpi=200, window=max(1, len(charts)), vector=vector)
+    for j, (_, result) in enumerate(results):
+        img_path = None
+        if result.image is not None and (result.meta or {}).get("format") != "svg":
+            img_path = os.path.join(chart_dir, f"chart_{j}.png")
+            with open(img_path, "wb") as f:
+                f.write(result.image)
+            result = result._replace(image=None)
+        rendered.append((result, img_path))
+        if progress is not None:
+            progress("rendering", j + 1, len(charts))
+    return rendered
+
+
+def create_pdf_report(data, suggestions, summary, vector: bool = PDF_VECTOR_CHARTS, output=None,
+                      template: str = DEFAULT_TEMPLATE, progress=None):
     """
     Create a professional PDF report with graphs and analysis
     
     Args:
-        data: List of dictionaries containing business data
+        data: Dataset (or DataFrame / list of dictionaries) containing business data
         suggestions: List of graph suggestions from Gemini
         summary: Business analysis summary text
+        vector: Embed charts as vector drawings (dense charts stay PNG; needs svglib)
+        output: Binary file object to write the PDF to (default: a new BytesIO)
+        template: Name of the report layout (see report_templates.TEMPLATES)
+        progress: Optional callback progress(stage, done=None, total=None), called
+            after each rendered chart ("rendering") and before layout ("assembling")
         
     Returns:
-        BytesIO: The PDF file as a bytes buffer
+        The file object holding the PDF, rewound to the start
     """
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, 
-                            rightMargin=72, leftMargin=72,
-                            topMargin=72, bottomMargin=72)
+    dataset = as_dataset(data)
+    layout = get_template(template)
+    if vector and not svglib_available():
+        logger.warning("svglib is not installed, embedding charts as PNG")
+        vector = False
+    buffer = output if output is not None else io.BytesIO()
+    # PNG charts wait on disk until ReportLab draws them, so the story holds
+    # file names rather than every chart image at once
+    chart_dir = tempfile.TemporaryDirectory(prefix="report-charts-")
+    doc = SimpleDocTemplate(buffer, pagesize=layout.pagesize, 
+                            rightMargin=layout.margin, leftMargin=layout.margin,
+                            topMargin=layout.margin, bottomMargin=layout.margin)
     
     story = []
     
-    # Define styles
-    styles = getSampleStyleSheet()
-    
-    # Create custom styles with improved formatting
-    title_style = ParagraphStyle(
-        'Title',
-        parent=styles['Title'],
-        fontSize=24,
-        spaceAfter=16,
-        alignment=TA_CENTER
-    )
-    
-    subtitle_style = ParagraphStyle(
-        'Subtitle',
-        parent=styles['Heading2'],
-        fontSize=18,
-        spaceBefore=12,
-        spaceAfter=8,
-        textColor=colors.navy
-    )
-    
-    body_style = ParagraphStyle(
-        'Body',
-        parent=styles['Normal'],
-        fontSize=11,
-        leading=14,
-        alignment=TA_JUSTIFY
-    )
-    
-    date_style = ParagraphStyle(
-        'DateStyle',
-        parent=styles['Italic'],
-        alignment=TA_CENTER,
-        fontSize=10,
-        spaceAfter=24
-    )
-    
-    chart_title_style = ParagraphStyle(
-        'ChartTitle',
-        parent=styles['Heading3'],
-        fontSize=14,
-        spaceBefore=12,
-        spaceAfter=6,
-        textColor=colors.darkblue
-    )
-    
-    insight_style = ParagraphStyle(
-        'Insight',
-        parent=styles['Normal'],
-        fontSize=11,
-        leading=14,
-        firstLineIndent=0,
-        alignment=TA_JUSTIFY
-    )
-    
-    bullet_style = ParagraphStyle(
-        'BulletPoint',
-        parent=styles['Normal'],
-        fontSize=11,
-        leading=16,
-        leftIndent=20,
-        firstLineIndent=-15
-    )
+    # Styles are shared, prebuilt objects (see report_templates)
+    styles = layout.styles
+    title_style = styles["title"]
+    subtitle_style = styles["subtitle"]
+    body_style = styles["body"]
+    date_style = styles["date"]
+    chart_title_style = styles["chart_title"]
+    insight_style = styles["insight"]
+    bullet_style = styles["bullet"]
+    space = layout.spacing
     
     # Add title and date
     story.append(Paragraph("Business Intelligence Report", title_style))
@@ -533,29 +563,29 @@ def create_pdf_report(data, suggestions, summary):
         # Join paragraphs with proper spacing
         for para in formatted_paragraphs:
             story.append(Paragraph(para, body_style))
-            story.append(Spacer(1, 0.1*inch))
+            story.append(Spacer(1, 0.1*inch*space))
     else:
         for para in paragraphs:
             if para.strip():  # Check if paragraph isn't empty
                 story.append(Paragraph(para.strip(), body_style))
-                story.append(Spacer(1, 0.1*inch))
+                story.append(Spacer(1, 0.1*inch*space))
     
-    story.append(Spacer(1, 0.15*inch))
+    story.append(Spacer(1, 0.15*inch*space))
     
     # Add data overview with improved table styling
-    df = pd.DataFrame(data)
+    df = dataset.frame
     story.append(Paragraph("Data Overview", subtitle_style))
     
-    # Format date strings to be more readable
+    # Format date strings to be more readable (dates were parsed when the dataset was built)
     date_range = "Date range unavailable"
     for date_col in ['date', 'Date']:
-        if date_col in df.columns:
+        if date_col in dataset.dates:
             try:
-                min_date = pd.to_datetime(df[date_col].min()).strftime('%Y-%m-%d')
-                max_date = pd.to_datetime(df[date_col].max()).strftime('%Y-%m-%d')
+                min_date = dataset.dates[date_col].min().strftime('%Y-%m-%d')
+                max_date = dataset.dates[date_col].max().strftime('%Y-%m-%d')
                 date_range = f"{min_date} to {max_date}"
                 break
-            except:
+            except (AttributeError, ValueError):
                 pass
     
     # Try to calculate total revenue or other metrics based on available columns
@@ -575,10 +605,10 @@ def create_pdf_report(data, suggestions, summary):
     
     # Add branch info if available
     if 'branch' in df.columns:
-        summary_data.append(["Number of Branches", str(len(df['branch'].unique()))])
+        summary_data.append(["Number of Branches", str(dataset.unique_counts['branch'])])
     elif 'symbol' in df.columns or 'Symbol' in df.columns:  # For stock data
         symbol_col = 'symbol' if 'symbol' in df.columns else 'Symbol'
-        summary_data.append(["Number of Symbols", str(len(df[symbol_col].unique()))])
+        summary_data.append(["Number of Symbols", str(dataset.unique_counts[symbol_col])])
     
     # Add average price if available for stock data
     for close_col in ['close', 'Close']:
@@ -593,35 +623,28 @@ def create_pdf_report(data, suggestions, summary):
             break
     
     # Create a better styled table
-    col_widths = [2.5*inch, 2.5*inch]
-    t = Table(summary_data, colWidths=col_widths)
-    t.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.lavender),
-        ('TEXTCOLOR', (0, 0), (0, -1), colors.black),
-        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),  # Right-align values
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-        ('BOX', (0, 0), (-1, -1), 1, colors.black),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    ]))
+    t = Table(summary_data, colWidths=layout.summary_col_widths)
+    t.setStyle(layout.summary_table_style)
     
     story.append(t)
-    story.append(Spacer(1, 0.3*inch))
+    story.append(Spacer(1, 0.3*inch*space))
     
     # Visualizations section with improved styling
     story.append(Paragraph("Key Business Insights", subtitle_style))
-    story.append(Spacer(1, 0.15*inch))
+    story.append(Spacer(1, 0.15*inch*space))
     
-    # Import generate_chart inside the function to avoid circular imports
-    from graph_gen import generate_chart
+    # Phase one: render every chart concurrently, then lay them out in order
+    charts = [chart for chart in suggestions if isinstance(chart, dict)]
+    with timed("render"):
+        rendered = iter(_render_report_charts(dataset, charts, chart_dir.name, vector, progress))
+    if progress is not None:
+        progress("assembling")
     
     # Generate and add charts with better formatting
     for i, chart in enumerate(suggestions):
         if not isinstance(chart, dict):
             continue
+        result, img_path = next(rendered)
             
         title = chart.get("title", f"Chart {i+1}")
         insight = chart.get("insight", "No specific insight provided.")
@@ -631,39 +654,47 @@ def create_pdf_report(data, suggestions, summary):
         
         # Add insight with proper formatting
         story.append(Paragraph(insight, insight_style))
-        story.append(Spacer(1, 0.15*inch))
+        story.append(Spacer(1, 0.15*inch*space))
         
         try:
-            # Generate chart for PDF (using light theme)
-            chart_fig = generate_chart(df, chart, for_pdf=True)
-            
-            # Save chart directly to BytesIO buffer
-            img_buffer = BytesIO()
-            chart_fig.savefig(img_buffer, format='png', bbox_inches='tight', dpi=200)
-            plt.close(chart_fig)
-            img_buffer.seek(0)
+            if result.error is not None:
+                raise result.error
+            meta = result.meta or {}
             
             # Add image to the report with proper sizing and centering
-            img = Image(img_buffer, width=6*inch, height=3*inch)
+            if img_path is not None:
+                img = Image(img_path, width=layout.chart_width, height=layout.chart_height, lazy=2)
+            elif meta.get("format") == "svg" and result.image is not None:
+                img = svg_flowable(result.image, layout.chart_width, layout.chart_height)
+            else:
+                raise ValueError("The chart has nothing to draw")
             img.hAlign = 'CENTER'  # Center the image
             story.append(img)
             
+            # Note when a large scatter/bubble chart was drawn as a density grid
+            if meta.get("render_mode") == "density":
+                story.append(Paragraph(f"Density view of {meta['rows']:,} points", styles["caption"]))
+            # ...and when the smallest categories were summed into "Other"
+            if meta.get("categories_folded"):
+                story.append(Paragraph(f"The {meta['categories_folded']:,} smallest categories are summed into \"Other\"",
+                                       styles["caption"]))
+
         except Exception as e:
             logger.error(f"Error generating chart {i}: {str(e)}", exc_info=True)
-            story.append(Paragraph(f"Error generating chart: {str(e)}", styles['Normal']))
+            story.append(Paragraph(f"Error generating chart: {str(e)}", styles["normal"]))
         
         # Add space after each chart
-        story.append(Spacer(1, 0.4*inch))
+        story.append(Spacer(1, 0.4*inch*space))
         
-        # Add page break after every second chart (except the last)
-        if i % 2 == 1 and i < len(suggestions) - 1:
+        # Add page break after every charts_per_page charts (except the last)
+        if i % layout.charts_per_page == layout.charts_per_page - 1 and i < len(suggestions) - 1:
             story.append(PageBreak())
     
     # Add recommendations section with proper formatting
     if suggestions:
         story.append(PageBreak())
         story.append(Paragraph("Recommendations", subtitle_style))
-        story.append(Spacer(1, 0.2*inch))
+        story.append(Spacer(1, 0.2*inch*space))
         
         # Try to extract recommendations from summary
         recommendation_paragraphs = summary.split('.')
@@ -689,9 +720,43 @@ def create_pdf_report(data, suggestions, summary):
                     clean_rec = clean_rec[1:].strip()
                     
                 story.append(Paragraph(f"• {clean_rec}", bullet_style))
-                story.append(Spacer(1, 0.1*inch))
+                story.append(Spacer(1, 0.1*inch*space))
     
     # Build the PDF
-    doc.build(story)
+    try:
+        with timed("pdf"):
+            if layout.on_page is not None:
+                doc.build(story, onFirstPage=layout.on_page, onLaterPages=layout.on_page)
+            else:
+                doc.build(story)
+    finally:
+        chart_dir.cleanup()
     buffer.seek(0)
-    return buffer
\ No newline at end of file
+    return buffer
+
+
+def spool_pdf_report(data, suggestions, summary, **kwargs):
+    """
+    Build the report into a spooled temporary file
+
+    Reports up to PDF_SPOOL_MEMORY_MB stay in memory, bigger ones spill to
+    disk. The caller owns the returned file and must close it.
+    """
+    output = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_MEMORY_MB * 1024 * 1024)
+    try:
+        return create_pdf_report(data, suggestions, summary, output=output, **kwargs)
+    except BaseException:
+        output.close()
+        raise
+
+
+def iter_file_chunks(file, chunk_size: int = 64 * 1024):
+    """Yield a file's contents in chunks, closing the file when done (or abandoned)"""
+    try:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        file.close()
\ No newline at end of file
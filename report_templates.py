@@ -0,0 +1,138 @@
+"""
+Named layouts for the PDF report.
+
+Paragraph styles, the summary table style and the page geometry of each
+template are built once at import and shared by every report (ReportLab
+only reads them while laying out a story), so a request only pays for its
+own content.
+"""
+from typing import Callable, NamedTuple, Optional
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import TableStyle
+
+_base = getSampleStyleSheet()
+
+
+class ReportTemplate(NamedTuple):
+    name: str
+    pagesize: tuple
+    margin: float
+    styles: dict  # title, subtitle, body, date, chart_title, insight, bullet, caption, normal
+    summary_table_style: TableStyle
+    summary_col_widths: list
+    chart_width: float
+    chart_height: float
+    charts_per_page: int
+    spacing: float  # multiplier applied to the vertical gaps between sections
+    on_page: Optional[Callable] = None  # drawn on every page (canvas, doc)
+
+
+def _page_number(canvas, doc):
+    canvas.saveState()
+    canvas.setFont("Helvetica", 8)
+    canvas.setFillColor(colors.grey)
+    canvas.drawRightString(doc.pagesize[0] - doc.rightMargin, doc.bottomMargin / 2, f"Page {doc.page}")
+    canvas.restoreState()
+
+
+def _business() -> ReportTemplate:
+    styles = {
+        "title": ParagraphStyle('Title', parent=_base['Title'], fontSize=24, spaceAfter=16, alignment=TA_CENTER),
+        "subtitle": ParagraphStyle('Subtitle', parent=_base['Heading2'], fontSize=18, spaceBefore=12, spaceAfter=8,
+                                   textColor=colors.navy),
+        "body": ParagraphStyle('Body', parent=_base['Normal'], fontSize=11, leading=14, alignment=TA_JUSTIFY),
+        "date": ParagraphStyle('DateStyle', parent=_base['Italic'], alignment=TA_CENTER, fontSize=10, spaceAfter=24),
+        "chart_title": ParagraphStyle('ChartTitle', parent=_base['Heading3'], fontSize=14, spaceBefore=12,
+                                      spaceAfter=6, textColor=colors.darkblue),
+        "insight": ParagraphStyle('Insight', parent=_base['Normal'], fontSize=11, leading=14, firstLineIndent=0,
+                                  alignment=TA_JUSTIFY),
+        "bullet": ParagraphStyle('BulletPoint', parent=_base['Normal'], fontSize=11, leading=16, leftIndent=20,
+                                 firstLineIndent=-15),
+        "caption": _base['Italic'],
+        "normal": _base['Normal'],
+    }
+    table_style = TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.lavender),
+        ('TEXTCOLOR', (0, 0), (0, -1), colors.black),
+        ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),  # Right-align values
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+        ('BOX', (0, 0), (-1, -1), 1, colors.black),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ])
+    return ReportTemplate(
+        name="business",
+        pagesize=letter,
+        margin=72,
+        styles=styles,
+        summary_table_style=table_style,
+        summary_col_widths=[2.5*inch, 2.5*inch],
+        chart_width=6*inch,
+        chart_height=3*inch,
+        charts_per_page=2,
+        spacing=1.0,
+    )
+
+
+def _compact() -> ReportTemplate:
+    """Smaller type, tighter margins and three charts per page"""
+    styles = {
+        "title": ParagraphStyle('CompactTitle', parent=_base['Title'], fontSize=18, spaceAfter=6, alignment=TA_CENTER),
+        "subtitle": ParagraphStyle('CompactSubtitle', parent=_base['Heading2'], fontSize=13, spaceBefore=6,
+                                   spaceAfter=4, textColor=colors.navy),
+        "body": ParagraphStyle('CompactBody', parent=_base['Normal'], fontSize=9, leading=11, alignment=TA_JUSTIFY),
+        "date": ParagraphStyle('CompactDate', parent=_base['Italic'], alignment=TA_CENTER, fontSize=8, spaceAfter=10),
+        "chart_title": ParagraphStyle('CompactChartTitle', parent=_base['Heading3'], fontSize=11, spaceBefore=4,
+                                      spaceAfter=2, textColor=colors.darkblue),
+        "insight": ParagraphStyle('CompactInsight', parent=_base['Normal'], fontSize=9, leading=11,
+                                  alignment=TA_JUSTIFY),
+        "bullet": ParagraphStyle('CompactBullet', parent=_base['Normal'], fontSize=9, leading=12, leftIndent=14,
+                                 firstLineIndent=-10),
+        "caption": ParagraphStyle('CompactCaption', parent=_base['Italic'], fontSize=8),
+        "normal": ParagraphStyle('CompactNormal', parent=_base['Normal'], fontSize=9),
+    }
+    table_style = TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.lavender),
+        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('TOPPADDING', (0, 0), (-1, -1), 2),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ])
+    return ReportTemplate(
+        name="compact",
+        pagesize=letter,
+        margin=40,
+        styles=styles,
+        summary_table_style=table_style,
+        summary_col_widths=[2*inch, 2*inch],
+        chart_width=6.5*inch,
+        chart_height=2.4*inch,
+        charts_per_page=3,
+        spacing=0.4,
+        on_page=_page_number,
+    )
+
+
+DEFAULT_TEMPLATE = "business"
+TEMPLATES = {t.name: t for t in (_business(), _compact())}
+
+
+def get_template(name: Optional[str] = None) -> ReportTemplate:
+    """
+    Look up a report template by name
+
+    Raises:
+        KeyError: for unknown template names
+    """
+    return TEMPLATES[name or DEFAULT_TEMPLATE]
@@ -1,14 +1,27 @@
 
 from pydantic import BaseModel
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 class DataRequest(BaseModel):
     data: List[Dict[str, Any]]
+    mode: Optional[str] = "llm"  # "fast" picks charts with the rule-based recommender instead of the LLM
 
     
 class DataRequest1(BaseModel):
     data: List[Dict[str, Any]]
     notes: str  # <-- new field
+    template: Optional[str] = "business"  # report layout: "business" or "compact"
+    mode: Optional[str] = "llm"  # "fast" picks charts with the rule-based recommender instead of the LLM
+
+
+class BatchReportRequest(DataRequest1):
+    partition: str  # column to split by: one report per distinct value
+
+
+class ColumnarDataRequest(BaseModel):
+    """Column-oriented alternative to DataRequest: one array per column"""
+    data: Dict[str, List[Any]]
+    notes: Optional[str] = None
     
 class GraphResponse(BaseModel):
     title: str
@@ -0,0 +1,203 @@
+"""
+Request body decoding for the dataset endpoints.
+
+Besides the original row-oriented JSON ({"data": [{...}, ...]}) the endpoints
+accept encodings that load straight into a DataFrame without building a
+Python dict per row:
+
+- column-oriented JSON: {"data": {"col": [v1, v2, ...], ...}}
+- CSV: Content-Type text/csv
+- Arrow IPC stream/file: application/vnd.apache.arrow.stream / .file
+- Parquet: application/vnd.apache.parquet
+- multipart/form-data with a "file" part in any of the formats above
+
+Other request fields (e.g. notes) come from the JSON object, the multipart
+form fields or the query string. Arrow and Parquet need pyarrow installed.
+Bodies are read on the event loop and decoded in the upload executor (see concurrency.py).
+"""
+import io
+import json
+import os
+from typing import NamedTuple
+
+import pandas as pd
+from fastapi import HTTPException, Request
+
+from concurrency import run_in_upload_executor
+from metrics import observe_upload, timed
+from schemas import ColumnarDataRequest, DataRequest
+
+CSV_TYPES = {"text/csv", "application/csv"}
+ARROW_STREAM_TYPES = {"application/vnd.apache.arrow.stream"}
+ARROW_FILE_TYPES = {"application/vnd.apache.arrow.file", "application/x-arrow"}
+PARQUET_TYPES = {"application/vnd.apache.parquet", "application/x-parquet", "application/parquet"}
+
+# File extensions used to guess the format of multipart parts sent as octet-stream
+EXTENSION_TYPES = {
+    ".csv": "text/csv",
+    ".arrow": "application/vnd.apache.arrow.file",
+    ".feather": "application/vnd.apache.arrow.file",
+    ".arrows": "application/vnd.apache.arrow.stream",
+    ".parquet": "application/vnd.apache.parquet",
+    ".json": "application/json",
+}
+
+
+# Rows of a CSV upload checked for number-like text that must stay text (leading zeros)
+CSV_PROBE_ROWS = 1000
+_LEADING_ZERO = r"^[+-]?0\d"
+
+
+class Upload(NamedTuple):
+    frame: pd.DataFrame
+    fields: dict
+
+
+def _media_type(content_type: str) -> str:
+    return (content_type or "").split(";")[0].strip().lower()
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+        return pyarrow
+    except ImportError:
+        raise HTTPException(status_code=415, detail="Arrow and Parquet uploads require pyarrow on the server")
+
+
+def _frame_from_json_data(data) -> pd.DataFrame:
+    if isinstance(data, list):
+        if not all(isinstance(row, dict) for row in data):
+            raise HTTPException(status_code=422, detail="'data' rows must be JSON objects")
+        return pd.DataFrame(data)
+    if isinstance(data, dict):
+        if not all(isinstance(col, list) for col in data.values()):
+            raise HTTPException(status_code=422, detail="Column-oriented 'data' must map column names to arrays")
+        lengths = {len(col) for col in data.values()}
+        if len(lengths) > 1:
+            raise HTTPException(status_code=422, detail="All columns in 'data' must have the same length")
+        return pd.DataFrame(data)
+    raise HTTPException(status_code=422, detail="'data' must be a list of rows or an object of columns")
+
+
+def parse_json_body(body: bytes) -> Upload:
+    try:
+        payload = json.loads(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+    if not isinstance(payload, dict) or "data" not in payload:
+        raise HTTPException(status_code=422, detail="JSON body must be an object with a 'data' field")
+    fields = {k: v for k, v in payload.items() if k != "data"}
+    return Upload(_frame_from_json_data(payload["data"]), fields)
+
+
+def read_csv(body: bytes) -> pd.DataFrame:
+    """
+    Read a CSV upload, inferring column types (CSV is the only untyped source)
+
+    Columns whose values have leading zeros (zip codes, ids, account numbers)
+    stay text instead of becoming numbers; they are found in the first
+    CSV_PROBE_ROWS rows.
+    """
+    probe = pd.read_csv(io.BytesIO(body), dtype=str, nrows=CSV_PROBE_ROWS)
+    text = [col for col in probe.columns if probe[col].str.match(_LEADING_ZERO, na=False).any()]
+    return pd.read_csv(io.BytesIO(body), dtype={col: str for col in text} or None)
+
+
+def parse_table(body: bytes, media_type: str) -> pd.DataFrame:
+    """Decode a CSV / Arrow / Parquet payload into a DataFrame"""
+    try:
+        if media_type in CSV_TYPES:
+            return read_csv(body)
+        if media_type in ARROW_STREAM_TYPES:
+            pa = _pyarrow()
+            return pa.ipc.open_stream(body).read_all().to_pandas()
+        if media_type in ARROW_FILE_TYPES:
+            pa = _pyarrow()
+            return pa.ipc.open_file(pa.BufferReader(body)).read_all().to_pandas()
+        if media_type in PARQUET_TYPES:
+            _pyarrow()
+            return pd.read_parquet(io.BytesIO(body))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not decode {media_type} upload: {e}")
+    raise HTTPException(status_code=415, detail=f"Unsupported upload type: {media_type or 'unknown'}")
+
+
+async def _parse_multipart(request: Request) -> Upload:
+    try:
+        form = await request.form()
+    except AssertionError:  # python-multipart is not installed
+        raise HTTPException(status_code=415, detail="multipart uploads require python-multipart on the server")
+    upload = form.get("file")
+    if upload is None or isinstance(upload, str):
+        raise HTTPException(status_code=422, detail="multipart upload needs a 'file' part")
+    fields = {k: v for k, v in form.items() if k != "file" and isinstance(v, str)}
+    body = await upload.read()
+    media_type = _media_type(upload.content_type)
+    if media_type not in EXTENSION_TYPES.values():
+        media_type = EXTENSION_TYPES.get(os.path.splitext(upload.filename or "")[1].lower(), media_type)
+    parsed = await run_in_upload_executor(parse_body, body, media_type)
+    return Upload(parsed.frame, {**parsed.fields, **fields})
+
+
+def parse_body(body: bytes, media_type: str) -> Upload:
+    """Decode a request body of any supported (non-multipart) type; blocking, run it in the upload executor"""
+    if media_type == "application/json":
+        return parse_json_body(body)
+    return Upload(parse_table(body, media_type), {})
+
+
+async def read_upload(request: Request) -> Upload:
+    """
+    Decode the dataset and the extra request fields from any supported encoding
+
+    Raises:
+        HTTPException: 400 for undecodable bodies, 415 for unsupported types,
+        422 for JSON of the wrong shape
+    """
+    media_type = _media_type(request.headers.get("content-type", "application/json"))
+    with timed("validation"):
+        if media_type == "multipart/form-data":
+            upload = await _parse_multipart(request)
+        else:
+            # The body is read on the loop; decoding and the DataFrame build run in the upload executor
+            upload = await run_in_upload_executor(parse_body, await request.body(), media_type)
+    size = request.headers.get("content-length")
+    observe_upload(request.url.path, int(size) if size and size.isdigit() else None, len(upload.frame))
+    fields = {**request.query_params, **upload.fields}
+    return Upload(upload.frame, fields)
+
+
+def require_field(upload: Upload, name: str) -> str:
+    value = upload.fields.get(name)
+    if not isinstance(value, str):
+        raise HTTPException(status_code=422, detail=f"'{name}' is required")
+    return value
+
+
+def upload_openapi(model=DataRequest) -> dict:
+    """openapi_extra describing every accepted request encoding"""
+    binary = {"schema": {"type": "string", "format": "binary"}}
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {"oneOf": [model.model_json_schema(), ColumnarDataRequest.model_json_schema()]}
+                },
+                "text/csv": binary,
+                "application/vnd.apache.arrow.stream": binary,
+                "application/vnd.apache.parquet": binary,
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {"file": {"type": "string", "format": "binary"}, "notes": {"type": "string"}},
+                        "required": ["file"],
+                    }
+                },
+            },
+        }
+    }
@@ -0,0 +1,59 @@
+"""
+Streaming ZIP writer.
+
+zipfile can write to an unseekable stream (it then emits data descriptors
+after each entry), so entries are compressed into a small sink and flushed
+to the caller one at a time. The archive is never held in memory as a whole.
+"""
+import os
+import zipfile
+
+# Already-compressed formats: deflating them again costs CPU for almost no gain
+STORED_SUFFIXES = (".png", ".jpg", ".jpeg", ".gif", ".webp", ".pdf", ".zip")
+
+
+def entry_compression(filename: str) -> int:
+    """Compression policy per entry: store images, deflate text"""
+    if os.path.splitext(filename)[1].lower() in STORED_SUFFIXES:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+class _ChunkSink:
+    """Write-only file object that collects bytes until they are drained"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(entries, compression=entry_compression):
+    """
+    Build a ZIP archive incrementally
+
+    Args:
+        entries: Iterable of (filename, bytes or str) pairs, consumed lazily
+        compression: Function mapping a filename to its zipfile compression method
+
+    Yields:
+        bytes: archive chunks, one per entry, followed by the central directory
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as zipf:
+        for name, data in entries:
+            zipf.writestr(name, data, compress_type=compression(name))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    yield sink.drain()